@@ -0,0 +1,78 @@
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Batch size is left to ultralytics' AutoBatch: a fractional ``batch`` makes
+# the trainer pick the largest batch that uses this share of GPU memory. It
+# falls back to the default batch size on CPU.
+AUTOBATCH_MEMORY_FRACTION = 0.70
+
+
+def probe_workers(dataset_yaml, imgsz, batch_size, target_images_per_s, batches=20):
+    """Find the smallest dataloader worker count that reaches
+    ``target_images_per_s``.
+
+    Returns ``(workers, images_per_s)``. Without a target, or if no candidate
+    reaches it, the fastest one is returned. Loader throughput per image barely
+    depends on the batch size, so the default one is fine to probe with.
+    """
+    from ultralytics.cfg import get_cfg
+    from ultralytics.data import build_dataloader, build_yolo_dataset
+    from ultralytics.data.utils import check_det_dataset
+
+    data = check_det_dataset(dataset_yaml)
+    cfg = get_cfg(overrides={"imgsz": imgsz, "batch": batch_size, "task": "detect"})
+    dataset = build_yolo_dataset(cfg, data["train"], batch_size, data, mode="train")
+
+    cpu_count = os.cpu_count() or 1
+    candidates = sorted({w for w in (2, 4, 8, 12, 16, 24, 32) if w < cpu_count} | {cpu_count})
+
+    best_workers, best_rate = candidates[0], 0.0
+    for workers in candidates:
+        loader = build_dataloader(dataset, batch_size, workers, True)
+        iterator = iter(loader)
+        next(iterator)  # exclude worker start-up from the measurement
+
+        images = 0
+        start = time.perf_counter()
+        for _ in range(batches):
+            try:
+                images += len(next(iterator)["im_file"])
+            except StopIteration:
+                break
+        rate = images / (time.perf_counter() - start)
+        del iterator, loader
+
+        logger.info(f"[autotune] workers {workers}: {rate:.1f} img/s")
+        if rate > best_rate:
+            best_workers, best_rate = workers, rate
+        if target_images_per_s and rate >= target_images_per_s * 1.1:
+            return workers, rate
+
+    return best_workers, best_rate
+
+
+def autotune(dataset_yaml, imgsz, default_batch_size, default_workers):
+    """Probe the dataloader workers to train with on this instance, and the
+    ``batch`` argument that has ultralytics size the batch to the GPU"""
+    logger.info("=" * 50)
+    logger.info("Autotuning dataloader workers, batch size left to AutoBatch")
+    logger.info("=" * 50)
+    start = time.time()
+
+    workers, loader_images_per_s = probe_workers(
+        dataset_yaml, imgsz, default_batch_size, None
+    )
+
+    results = {
+        "batch": AUTOBATCH_MEMORY_FRACTION,
+        "workers": workers,
+        "loader_images_per_s": round(loader_images_per_s, 1),
+        "default_batch_size": default_batch_size,
+        "default_workers": default_workers,
+        "duration_s": round(time.time() - start, 1),
+    }
+    logger.info(f"Autotune results: {results}")
+    return results
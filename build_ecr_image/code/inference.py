@@ -1,18 +1,202 @@
 import numpy as np
-import torch, os, json, base64, cv2, time
+import torch, os, io, json, base64, cv2, time, threading
+import boto3
+from botocore.config import Config
 from ultralytics import YOLO
+from ultralytics.engine.results import Results
+
+
+# Ultralytics predictors keep per-call state, serialise access to the model
+PREDICT_LOCK = threading.Lock()
+
+# How long model_fn spent loading and warming up. Each worker also returns it
+# in the timings of its first response, as "model_load" and "warmup" (ms).
+LOAD_STATS = {}
+LOAD_STATS_REPORTED = False
+
+# Per-request stage timings in milliseconds are returned in the
+# CustomAttributes response header (and in JSON bodies). The invoke Lambda
+# publishes them as metrics: lines printed from a TorchServe worker get a log
+# prefix, so CloudWatch would not extract them as embedded metrics.
+#
+# Wall-clock stages that together make up the time spent in the handlers
+ENDPOINT_STAGES = ("s3_get", "b64decode", "imdecode", "predict", "serialize")
+
+
+def elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def stage_timings(results):
+    """Sum the ultralytics per-image speeds (ms) over a batch. Postprocess is
+    mostly NMS, preprocess is letterboxing and the tensor copy to the device."""
+    timings = {}
+    for result in results:
+        for key, value in (result.speed or {}).items():
+            if value is not None:
+                timings[key] = round(timings.get(key, 0.0) + value, 2)
+    return timings
+
+
+def load_timings():
+    """This worker's load and warm-up time, only for its first response"""
+    global LOAD_STATS_REPORTED
+    if LOAD_STATS_REPORTED or not LOAD_STATS:
+        return {}
+    LOAD_STATS_REPORTED = True
+    return {
+        "model_load": round(LOAD_STATS["load_seconds"] * 1000, 2),
+        "warmup": round(LOAD_STATS["warmup_seconds"] * 1000, 2),
+    }
+
+
+def set_timings_header(context, timings):
+    """Return the timings to the caller as "timings=stage:ms;stage:ms" in the
+    CustomAttributes response header, which works for binary bodies too"""
+    if context is None:
+        return
+    value = ";".join(f"{stage}:{ms}" for stage, ms in timings.items())
+    try:
+        context.set_response_header(0, CUSTOM_ATTRIBUTES_HEADER, f"timings={value}")
+    except Exception as e:
+        print(f"Could not set response header: {e}")
 
 
 def model_fn(model_dir):
     print("Executing model_fn from inference.py ...")
     env = os.environ
+    load_start = time.time()
+
+    device = "cuda:0" if torch.cuda.is_available() else "cpu"
+    half = device != "cpu" and env.get("YOLO11_HALF", "true").lower() == "true"
+
+    # Place and fuse the model once instead of on every request
     model = YOLO(os.path.join(model_dir, env["YOLO11_MODEL"]))
+    model.to(device)
+    model.fuse()
+    model.overrides.update({"device": device, "half": half})
+    load_seconds = time.time() - load_start
+
+    # Dummy inferences build the predictor and initialise CUDA kernels
+    # before the first real request arrives
+    warmup_start = time.time()
+    imgsz = int(env.get("YOLO11_IMGSZ", "640"))
+    dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    for _ in range(int(env.get("YOLO11_WARMUP_RUNS", "2"))):
+        model(dummy, conf=DEFAULT_CONF, iou=DEFAULT_IOU, verbose=False)
+    warmup_seconds = time.time() - warmup_start
+
+    LOAD_STATS.update(
+        {
+            "device": device,
+            "half": half,
+            "load_seconds": round(load_seconds, 3),
+            "warmup_seconds": round(warmup_seconds, 3),
+        }
+    )
+    print(f"Model ready: {LOAD_STATS}")
     return model
 
 
-def input_fn(request_body, request_content_type):
+# Raw image bodies, conf/iou travel in the CustomAttributes header
+IMAGE_CONTENT_TYPES = ("image/jpeg", "image/png", "application/x-image")
+CUSTOM_ATTRIBUTES_HEADER = "X-Amzn-SageMaker-Custom-Attributes"
+# Multi-image requests: an NPZ archive holding one encoded image (uint8 array)
+# per key "image_0", "image_1", ..., answered with one result per image in order
+BATCH_CONTENT_TYPE = "application/x-npz"
+DEFAULT_CONF = 0.25
+DEFAULT_IOU = 0.7
+# The body is just "s3://bucket/key" and the endpoint reads the image itself,
+# so the caller doesn't have to download and re-upload it
+S3_URI_CONTENT_TYPE = "application/x-s3-uri"
+
+# One client per worker process, its connection pool is reused across requests
+S3_CLIENT = boto3.client(
+    "s3",
+    config=Config(
+        max_pool_connections=int(os.environ.get("S3_MAX_POOL_CONNECTIONS", "10")),
+        retries={"max_attempts": 3, "mode": "standard"},
+        tcp_keepalive=True,
+    ),
+)
+
+
+def parse_custom_attributes(context):
+    """Parse "conf=0.52,iou=0.75" from the CustomAttributes request header"""
+    if context is None:
+        return {}
+    header = context.get_request_header(
+        0, CUSTOM_ATTRIBUTES_HEADER
+    ) or context.get_request_header(0, CUSTOM_ATTRIBUTES_HEADER.lower())
+    if not header:
+        return {}
+    if isinstance(header, (bytes, bytearray)):
+        header = header.decode("utf-8")
+
+    attributes = {}
+    for item in header.split(","):
+        key, sep, value = item.partition("=")
+        if sep:
+            attributes[key.strip()] = value.strip()
+    return attributes
+
+
+def decode_image(image_bytes):
+    img = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise Exception("Could not decode image")
+    return img
+
+
+def fetch_s3_object(uri):
+    if isinstance(uri, (bytes, bytearray)):
+        uri = uri.decode("utf-8")
+    uri = uri.strip()
+    if not uri.startswith("s3://"):
+        raise Exception("Expected an s3://bucket/key URI, got: " + uri[:100])
+    bucket, _, key = uri[len("s3://") :].partition("/")
+    return S3_CLIENT.get_object(Bucket=bucket, Key=key)["Body"].read()
+
+
+def input_fn(request_body, request_content_type, context=None):
     print("Executing input_fn from inference.py ...")
-    if request_content_type == "text/csv":
+    if request_content_type == BATCH_CONTENT_TYPE:
+        attributes = parse_custom_attributes(context)
+        conf = float(attributes.get("conf", DEFAULT_CONF))
+        iou = float(attributes.get("iou", DEFAULT_IOU))
+
+        start = time.perf_counter()
+        with np.load(io.BytesIO(request_body)) as archive:
+            keys = sorted(archive.files, key=lambda k: int(k.rsplit("_", 1)[-1]))
+            images = [decode_image(archive[key].tobytes()) for key in keys]
+        timings = {"imdecode": elapsed_ms(start)}
+
+        print(f"Decoded batch of {len(images)} images")
+        return {"images": images, "conf": conf, "iou": iou, "timings": timings}
+    elif request_content_type in IMAGE_CONTENT_TYPES + (S3_URI_CONTENT_TYPE,):
+        attributes = parse_custom_attributes(context)
+        conf = float(attributes.get("conf", DEFAULT_CONF))
+        iou = float(attributes.get("iou", DEFAULT_IOU))
+
+        timings = {}
+        if request_content_type == S3_URI_CONTENT_TYPE:
+            start = time.perf_counter()
+            request_body = fetch_s3_object(request_body)
+            timings["s3_get"] = elapsed_ms(start)
+
+        # Decode the image straight from the request bytes
+        start = time.perf_counter()
+        img = decode_image(request_body)
+        timings["imdecode"] = elapsed_ms(start)
+
+        return {
+            "image": img,
+            "conf": conf,
+            "iou": iou,
+            "tile": parse_tile_options(attributes),
+            "timings": timings,
+        }
+    elif request_content_type == "text/csv":
         # Split the request body by comma to get image and parameters
         parts = request_body.split("|")
 
@@ -20,8 +204,8 @@ def input_fn(request_body, request_content_type):
         image_b64 = parts[0]
 
         # Default values
-        conf = 0.25
-        iou = 0.7
+        conf = DEFAULT_CONF
+        iou = DEFAULT_IOU
 
         # Parse additional parameters if provided
         if len(parts) > 1:
@@ -30,44 +214,345 @@ def input_fn(request_body, request_content_type):
             iou = float(parts[2])
 
         # Decode the image
+        start = time.perf_counter()
         jpg_original = base64.b64decode(image_b64)
+        timings = {"b64decode": elapsed_ms(start)}
+
+        start = time.perf_counter()
         jpg_as_np = np.frombuffer(jpg_original, dtype=np.uint8)
         img = cv2.imdecode(jpg_as_np, flags=-1)
+        timings["imdecode"] = elapsed_ms(start)
 
-        return {"image": img, "conf": conf, "iou": iou}
+        return {"image": img, "conf": conf, "iou": iou, "timings": timings}
     else:
         raise Exception("Unsupported content type: " + request_content_type)
 
 
+# Tiled inference, selected per request with CustomAttributes
+# "tile=1[,tile_size=640,tile_overlap=0.2,tile_max_side=1920,tile_match=0.6]"
+DEFAULT_TILE_OPTIONS = {
+    "tile_size": 640,
+    "tile_overlap": 0.2,
+    "tile_max_side": 1920,
+    "tile_match": 0.6,
+}
+
+
+def parse_tile_options(attributes):
+    if attributes.get("tile", "0").lower() not in ("1", "true"):
+        return None
+    options = dict(DEFAULT_TILE_OPTIONS)
+    for key, default in DEFAULT_TILE_OPTIONS.items():
+        if key in attributes:
+            options[key] = type(default)(float(attributes[key]))
+    return options
+
+
+def tile_windows(height, width, tile_size, overlap):
+    """Overlapping (x1, y1, x2, y2) windows covering the image, edge tiles are
+    shifted inwards so every tile keeps the full tile size"""
+    step = max(int(tile_size * (1 - overlap)), 1)
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size + 1, step))
+        if positions[-1] + tile_size < length:
+            positions.append(length - tile_size)
+        return positions
+
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in starts(height)
+        for x in starts(width)
+    ]
+
+
+def merge_tiled_detections(detections, match_threshold):
+    """Greedy non-maximum merging across tiles.
+
+    Boxes of the same class whose intersection over the smaller box exceeds
+    ``match_threshold`` are merged into their union, keeping the highest
+    score. Intersection over the smaller box (rather than IoU) also matches
+    objects cut in half by a tile border with their full-image detection.
+    """
+    if not len(detections):
+        return detections
+
+    detections = detections[detections[:, 4].argsort(descending=True)]
+    boxes, classes = detections[:, :4], detections[:, 5]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    suppressed = torch.zeros(len(detections), dtype=torch.bool, device=detections.device)
+
+    merged = []
+    for i in range(len(detections)):
+        if suppressed[i]:
+            continue
+        candidates = (~suppressed) & (classes == classes[i])
+        candidates[: i + 1] = False
+        idx = candidates.nonzero(as_tuple=True)[0]
+
+        box = detections[i].clone()
+        if len(idx):
+            top_left = torch.max(boxes[idx, :2], boxes[i, :2])
+            bottom_right = torch.min(boxes[idx, 2:], boxes[i, 2:])
+            inter = (bottom_right - top_left).clamp(min=0).prod(1)
+            ios = inter / torch.min(areas[idx], areas[i]).clamp(min=1e-6)
+            matched = idx[ios > match_threshold]
+            if len(matched):
+                suppressed[matched] = True
+                box[:2] = torch.min(boxes[matched, :2].min(0).values, boxes[i, :2])
+                box[2:4] = torch.max(boxes[matched, 2:].max(0).values, boxes[i, 2:])
+        merged.append(box)
+
+    return torch.stack(merged)
+
+
+def predict_tiled(model, img, conf, iou, options):
+    """Run overlapping tiles plus the whole image through the model as one batch
+    and merge the detections back into full-image coordinates"""
+    height, width = img.shape[:2]
+    scale = min(options["tile_max_side"] / max(height, width), 1.0)
+    work = img
+    if scale < 1.0:
+        work = cv2.resize(
+            img, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA
+        )
+
+    windows = tile_windows(
+        work.shape[0], work.shape[1], options["tile_size"], options["tile_overlap"]
+    )
+    # The whole image catches objects larger than a tile, e.g. shelves
+    crops = [img] + [work[y1:y2, x1:x2] for x1, y1, x2, y2 in windows]
+    print(f"Tiled inference: {len(windows)} tiles + full image in one batch")
+
+    with PREDICT_LOCK, torch.no_grad():
+        results = model(crops, conf=conf, iou=iou)
+
+    detections = [results[0].boxes.data]
+    for (x1, y1, _, _), result in zip(windows, results[1:]):
+        data = result.boxes.data.clone()
+        data[:, [0, 2]] = (data[:, [0, 2]] + x1) / scale
+        data[:, [1, 3]] = (data[:, [1, 3]] + y1) / scale
+        detections.append(data)
+
+    merged = merge_tiled_detections(torch.cat(detections), options["tile_match"])
+    # Report the whole tiled batch as this image's stage timings
+    speed = {key: sum(r.speed[key] for r in results) for key in results[0].speed}
+    return Results(orig_img=img, path="", names=model.names, boxes=merged, speed=speed)
+
+
+def run_model(model, images, conf, iou):
+    with PREDICT_LOCK, torch.no_grad():
+        # Run inference with parameters, a list of images is one batched forward pass
+        return model(images, conf=conf, iou=iou)
+
+
 def predict_fn(input_data, model):
     print("Executing predict_fn from inference.py ...")
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model.to(device)
 
-    with torch.no_grad():
-        # Extract image and parameters
-        img = input_data["image"]
-        conf = input_data["conf"]
-        iou = input_data["iou"]
+    # Extract image(s) and parameters
+    batch = "images" in input_data
+    images = input_data["images"] if batch else input_data["image"]
+    conf = input_data["conf"]
+    iou = input_data["iou"]
+
+    print(f"Running inference with conf={conf}, iou={iou}")
+
+    start = time.perf_counter()
+    if not batch and input_data.get("tile"):
+        results = [predict_tiled(model, images, conf, iou, input_data["tile"])]
+    else:
+        results = run_model(model, images, conf, iou)
+
+    timings = dict(input_data.get("timings", {}))
+    timings.update(stage_timings(results))
+    timings["predict"] = elapsed_ms(start)
+    return {"results": results, "batch": batch, "timings": timings}
+
+
+# Binary responses carrying float32 arrays, chosen by the Accept header.
+# application/x-npy holds only the boxes, (N, 6) for a single image and
+# (N, 7) with the image index as first column for a batch.
+# application/x-npz holds every output array, suffixed "_<i>" for a batch.
+NPY_CONTENT_TYPE = "application/x-npy"
+NPZ_CONTENT_TYPE = "application/x-npz"
+RESULT_FIELDS = ("boxes", "masks", "keypoints", "probs")
+
+
+def result_to_arrays(result):
+    arrays = {}
+    for field in RESULT_FIELDS:
+        value = getattr(result, field, None) if field in result._keys else None
+        if value is not None:
+            arrays[field] = value.cpu().numpy().data.astype(np.float32)
+    return arrays
+
+
+def result_to_dict(result):
+    return {field: array.tolist() for field, array in result_to_arrays(result).items()}
+
+
+def output_npy(results, batch):
+    boxes = [result_to_arrays(r).get("boxes", np.zeros((0, 6), np.float32)) for r in results]
+    if batch:
+        boxes = [
+            np.hstack([np.full((len(b), 1), i, dtype=np.float32), b])
+            for i, b in enumerate(boxes)
+        ]
+        array = np.concatenate(boxes) if boxes else np.zeros((0, 7), np.float32)
+    else:
+        array = boxes[0] if boxes else np.zeros((0, 6), np.float32)
+
+    buffer = io.BytesIO()
+    np.save(buffer, np.ascontiguousarray(array, dtype=np.float32))
+    return buffer.getvalue()
 
-        print(f"Running inference with conf={conf}, iou={iou}")
 
-        # Run inference with parameters
-        result = model(img, conf=conf, iou=iou)
+def output_npz(results, batch):
+    arrays = {}
+    for i, result in enumerate(results):
+        for field, array in result_to_arrays(result).items():
+            arrays[f"{field}_{i}" if batch else field] = array
 
-    return result
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
 
 
-def output_fn(prediction_output, content_type):
+def output_fn(prediction_output, content_type, context=None):
     print("Executing output_fn from inference.py ...")
-    infer = {}
-    for result in prediction_output:
-        if "boxes" in result._keys and result.boxes is not None:
-            infer["boxes"] = result.boxes.cpu().numpy().data.tolist()
-        if "masks" in result._keys and result.masks is not None:
-            infer["masks"] = result.masks.cpu().numpy().data.tolist()
-        if "keypoints" in result._keys and result.keypoints is not None:
-            infer["keypoints"] = result.keypoints.cpu().numpy().data.tolist()
-        if "probs" in result._keys and result.probs is not None:
-            infer["probs"] = result.probs.cpu().numpy().data.tolist()
-    return json.dumps(infer)
+    results = prediction_output["results"]
+    batch = prediction_output["batch"]
+    timings = prediction_output.get("timings", {})
+
+    start = time.perf_counter()
+    if content_type == NPY_CONTENT_TYPE:
+        body = output_npy(results, batch)
+    elif content_type == NPZ_CONTENT_TYPE:
+        body = output_npz(results, batch)
+    elif batch:
+        body = {"results": [result_to_dict(r) for r in results]}
+    else:
+        body = {}
+        for result in results:
+            body.update(result_to_dict(result))
+    # For JSON this covers the conversion to lists, the final json.dumps
+    # below has to run after the timings are known
+    timings["serialize"] = elapsed_ms(start)
+    timings["endpoint"] = round(
+        sum(timings.get(stage, 0.0) for stage in ENDPOINT_STAGES), 2
+    )
+    timings.update(load_timings())
+
+    if isinstance(body, dict):
+        body["timings"] = timings
+        body = json.dumps(body)
+
+    set_timings_header(context, timings)
+    return body
+
+
+# TorchServe batching. With SAGEMAKER_TS_BATCH_SIZE > 1 (set by
+# 2_create_endpoint from "micro_batch_max_size") TorchServe waits up to
+# SAGEMAKER_TS_MAX_BATCH_DELAY ms for that many requests and hands them to the
+# handler together. The inference toolkit's handler still runs them one by one,
+# so serving_entrypoint.py registers ``handle`` instead: single-image requests
+# sharing conf/iou go through one forward pass, the others through predict_fn.
+UTF8_CONTENT_TYPES = ("text/csv", "application/json", "text/plain")
+DEFAULT_ACCEPT = "application/json"
+BATCH_MODEL = None
+
+
+class BatchRequestContext:
+    """One request's view of a TorchServe batch context, so the single-request
+    functions above keep reading and writing the headers of index 0"""
+
+    def __init__(self, context, idx):
+        self.context = context
+        self.idx = idx
+
+    def get_request_header(self, idx, key):
+        return self.context.get_request_header(self.idx, key)
+
+    def set_response_header(self, idx, key, value):
+        return self.context.set_response_header(self.idx, key, value)
+
+
+def request_header(context, name):
+    value = context.get_request_header(0, name) or context.get_request_header(
+        0, name.lower()
+    )
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode("utf-8")
+    return value
+
+
+def predict_batch(inputs, model):
+    """predict_fn over a list of input_fn outputs (None for failed requests),
+    sharing one forward pass between the plain single-image requests"""
+    predictions = [None] * len(inputs)
+    groups = {}
+    for i, input_data in enumerate(inputs):
+        if input_data is None:
+            continue
+        if "images" in input_data or input_data.get("tile"):
+            predictions[i] = predict_fn(input_data, model)
+        else:
+            groups.setdefault((input_data["conf"], input_data["iou"]), []).append(i)
+
+    for (conf, iou), indices in groups.items():
+        start = time.perf_counter()
+        results = run_model(model, [inputs[i]["image"] for i in indices], conf, iou)
+        predict_ms = elapsed_ms(start)
+        print(f"Batch of {len(indices)} requests with conf={conf}, iou={iou}")
+
+        for i, result in zip(indices, results):
+            timings = dict(inputs[i].get("timings", {}))
+            timings.update(stage_timings([result]))
+            # The forward pass is shared, each request waited for all of it
+            timings["predict"] = predict_ms
+            timings["batch_size"] = len(indices)
+            predictions[i] = {"results": [result], "batch": False, "timings": timings}
+    return predictions
+
+
+def handle(data, context):
+    """TorchServe entry point for batched requests, see serving_entrypoint.py"""
+    global BATCH_MODEL
+    if BATCH_MODEL is None:
+        BATCH_MODEL = model_fn(context.system_properties.get("model_dir"))
+    if data is None:
+        # Called once when the worker loads the model
+        return None
+
+    views = [BatchRequestContext(context, i) for i in range(len(data))]
+    inputs, accepts, errors = [], [], {}
+    for i, (request, view) in enumerate(zip(data, views)):
+        accept = request_header(view, "Accept")
+        accepts.append(accept if accept and accept != "*/*" else DEFAULT_ACCEPT)
+        try:
+            content_type = request_header(view, "Content-Type")
+            body = request.get("body") or request.get("data")
+            if content_type in UTF8_CONTENT_TYPES and isinstance(body, (bytes, bytearray)):
+                body = body.decode("utf-8")
+            inputs.append(input_fn(body, content_type, view))
+        except Exception as e:
+            inputs.append(None)
+            errors[i] = e
+
+    predictions = predict_batch(inputs, BATCH_MODEL)
+
+    responses = []
+    for i, view in enumerate(views):
+        try:
+            if i in errors:
+                raise errors[i]
+            responses.append(output_fn(predictions[i], accepts[i], view))
+            context.set_response_content_type(i, accepts[i])
+        except Exception as e:
+            print(f"Request {i} of the batch failed: {e}")
+            context.set_response_status(500, str(e), i)
+            context.set_response_content_type(i, DEFAULT_ACCEPT)
+            responses.append(json.dumps({"error": str(e)}))
+    return responses
@@ -0,0 +1,116 @@
+# export_onnx.py
+# Export trained weights to ONNX and quantize them to int8 for the invoke
+# Lambda's in-process detector (YOLO_INFERENCE_MODE=local).
+#
+#   python export_onnx.py --weights model.pt --calibration-images ./samples \
+#       --upload s3://<bucket>/tranining-model/<job>/output/model.int8.onnx
+#
+# With --calibration-images the activations are quantized too (static
+# quantization, fastest on CPU). Without, only the weights are (dynamic).
+import os
+import argparse
+import numpy as np
+import cv2
+import boto3
+from ultralytics import YOLO
+from onnxruntime.quantization import (
+    CalibrationDataReader,
+    QuantFormat,
+    QuantType,
+    quantize_dynamic,
+    quantize_static,
+)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--weights", type=str, required=True)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--calibration-images", type=str, default=None)
+    parser.add_argument("--calibration-count", type=int, default=100)
+    parser.add_argument("--output", type=str, default=None)
+    parser.add_argument("--upload", type=str, default=None, help="S3 URI to upload to")
+    return parser.parse_args()
+
+
+def letterbox(image, imgsz, color=(114, 114, 114)):
+    """Same letterbox as the invoke Lambda applies before inference"""
+    height, width = image.shape[:2]
+    scale = min(imgsz / height, imgsz / width, 1.0)
+    new_width, new_height = round(width * scale), round(height * scale)
+    if (new_width, new_height) != (width, height):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_AREA)
+    pad_x, pad_y = (imgsz - new_width) / 2, (imgsz - new_height) / 2
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    return cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+
+
+def to_input(image, imgsz):
+    image = letterbox(image, imgsz)[:, :, ::-1].transpose(2, 0, 1)  # BGR HWC -> RGB CHW
+    return np.ascontiguousarray(image, dtype=np.float32)[None] / 255.0
+
+
+class ImageCalibrationReader(CalibrationDataReader):
+    def __init__(self, directory, input_name, imgsz, count):
+        names = [
+            n for n in sorted(os.listdir(directory))
+            if n.lower().endswith((".jpg", ".jpeg", ".png"))
+        ][:count]
+        self.paths = iter(os.path.join(directory, n) for n in names)
+        self.input_name = input_name
+        self.imgsz = imgsz
+        print(f"Calibrating on {len(names)} images")
+
+    def get_next(self):
+        for path in self.paths:
+            image = cv2.imread(path)
+            if image is not None:
+                return {self.input_name: to_input(image, self.imgsz)}
+        return None
+
+
+def export_int8(weights, imgsz, calibration_images=None, calibration_count=100, output=None):
+    fp32_path = YOLO(weights).export(format="onnx", imgsz=imgsz, dynamic=False, simplify=True)
+    output = output or os.path.splitext(fp32_path)[0] + ".int8.onnx"
+
+    prepared_path = os.path.splitext(fp32_path)[0] + ".prep.onnx"
+    quant_pre_process(fp32_path, prepared_path)
+
+    if calibration_images:
+        import onnx
+
+        input_name = onnx.load(prepared_path).graph.input[0].name
+        quantize_static(
+            prepared_path,
+            output,
+            ImageCalibrationReader(calibration_images, input_name, imgsz, calibration_count),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+        )
+    else:
+        quantize_dynamic(prepared_path, output, weight_type=QuantType.QUInt8)
+
+    print(
+        f"Quantized model: {output} ({os.path.getsize(output) / 1024**2:.1f} MB, "
+        f"fp32 {os.path.getsize(fp32_path) / 1024**2:.1f} MB)"
+    )
+    return output
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    path = export_int8(
+        args.weights,
+        args.imgsz,
+        args.calibration_images,
+        args.calibration_count,
+        args.output,
+    )
+    if args.upload:
+        bucket, _, key = args.upload.replace("s3://", "", 1).partition("/")
+        boto3.client("s3").upload_file(path, bucket, key)
+        print(f"Uploaded to {args.upload}")
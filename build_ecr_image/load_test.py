@@ -0,0 +1,170 @@
+"""Replay a directory of images against /invocations at a fixed request rate.
+
+Requests are sent open-loop, on schedule whether or not earlier ones have
+returned, so queueing in the server shows up in the latency percentiles.
+
+    python load_test.py --images ./samples --rps 5 --duration 60
+"""
+
+import os
+import json
+import math
+import time
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+CONTENT_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png"}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", type=str, default="http://127.0.0.1:8080/invocations")
+    parser.add_argument("--images", type=str, required=True, help="Directory of images to replay")
+    parser.add_argument("--rps", type=float, default=1.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to send for")
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--accept", type=str, default="application/x-npy")
+    parser.add_argument("--custom-attributes", type=str, default="conf=0.52,iou=0.75")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", type=str, default=None, help="Write the report as JSON")
+    return parser.parse_args()
+
+
+def load_images(directory):
+    images = []
+    for name in sorted(os.listdir(directory)):
+        content_type = CONTENT_TYPES.get(os.path.splitext(name)[1].lower())
+        if content_type:
+            with open(os.path.join(directory, name), "rb") as f:
+                images.append((name, f.read(), content_type))
+    if not images:
+        raise ValueError(f"No .jpg/.jpeg/.png images in {directory}")
+    return images
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return None
+    index = max(0, math.ceil(q / 100 * len(values)) - 1)
+    return values[index]
+
+
+def endpoint_ms(custom_attributes):
+    """The endpoint's own handler time from the "timings=..." response header"""
+    for attribute in (custom_attributes or "").split(","):
+        key, _, value = attribute.partition("=")
+        if key.strip() == "timings":
+            for item in value.split(";"):
+                stage, _, ms = item.partition(":")
+                if stage == "endpoint" and ms:
+                    return float(ms)
+    return None
+
+
+def send(url, image, content_type, args):
+    request = urllib.request.Request(
+        url,
+        data=image,
+        method="POST",
+        headers={
+            "Content-Type": content_type,
+            "Accept": args.accept,
+            "X-Amzn-SageMaker-Custom-Attributes": args.custom_attributes,
+        },
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=args.timeout) as response:
+            response.read()
+            header = response.headers.get("X-Amzn-SageMaker-Custom-Attributes")
+        return (time.perf_counter() - start) * 1000, endpoint_ms(header), None
+    except (urllib.error.URLError, OSError) as e:
+        return (time.perf_counter() - start) * 1000, None, str(e)
+
+
+def run(args):
+    images = load_images(args.images)
+    total = max(1, int(args.rps * args.duration))
+    interval = 1.0 / args.rps
+    print(f"Sending {total} requests at {args.rps} rps from {len(images)} images to {args.url}")
+
+    results = []
+    lock = threading.Lock()
+    in_flight = threading.BoundedSemaphore(args.max_in_flight)
+    dropped = 0
+
+    def task(name, image, content_type):
+        try:
+            outcome = send(args.url, image, content_type, args)
+        finally:
+            in_flight.release()
+        with lock:
+            results.append(outcome)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.max_in_flight) as pool:
+        for i in range(total):
+            delay = start + i * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if not in_flight.acquire(blocking=False):
+                # The server is too far behind, don't let the backlog grow unbounded
+                dropped += 1
+                continue
+            pool.submit(task, *images[i % len(images)])
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(r[0] for r in results if r[2] is None)
+    endpoint = sorted(r[1] for r in results if r[1] is not None)
+    errors = [r[2] for r in results if r[2] is not None]
+
+    report = {
+        "target_rps": args.rps,
+        "sent": len(results),
+        "succeeded": len(latencies),
+        "errors": len(errors),
+        "dropped": dropped,
+        "duration_s": round(elapsed, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 1) if latencies else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None,
+        },
+        "endpoint_ms": {
+            "p50": percentile(endpoint, 50),
+            "p95": percentile(endpoint, 95),
+            "p99": percentile(endpoint, 99),
+        },
+    }
+    for section in ("latency_ms", "endpoint_ms"):
+        report[section] = {
+            k: round(v, 1) if v is not None else None for k, v in report[section].items()
+        }
+    if errors:
+        report["first_error"] = errors[0]
+    return report
+
+
+def main():
+    args = parse_args()
+    report = run(args)
+
+    print("=" * 50)
+    print("Load test results")
+    print("=" * 50)
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
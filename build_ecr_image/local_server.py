@@ -0,0 +1,165 @@
+"""Serve code/inference.py locally the way the SageMaker PyTorch container does.
+
+model_fn runs once at start-up, then every POST /invocations goes through
+input_fn -> predict_fn -> output_fn with the request's Content-Type, Accept
+and CustomAttributes, and GET /ping reports health. Runs on CPU by default so
+performance changes can be measured without deploying an endpoint.
+
+    python local_server.py --model-dir ./model --model best.pt
+    python load_test.py --images ./samples --rps 5 --duration 60
+"""
+
+import os
+import sys
+import argparse
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-dir", type=str, default="/opt/ml/model")
+    parser.add_argument(
+        "--model",
+        type=str,
+        default=None,
+        help="Weights file inside --model-dir, sets YOLO11_MODEL",
+    )
+    parser.add_argument(
+        "--script",
+        type=str,
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "code", "inference.py"),
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--gpu",
+        action="store_true",
+        help="Keep CUDA visible, by default the server runs on CPU",
+    )
+    parser.add_argument(
+        "--threaded",
+        action="store_true",
+        help="Handle requests concurrently, by default one at a time like a single model worker",
+    )
+    return parser.parse_args()
+
+
+args = parse_args()
+
+# Must happen before inference.py imports torch
+if not args.gpu:
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+if args.model:
+    os.environ["YOLO11_MODEL"] = args.model
+
+import time
+import inspect
+import traceback
+import importlib.util
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+
+# Same defaults as the SageMaker inference toolkit
+DEFAULT_ACCEPT = os.environ.get("SAGEMAKER_DEFAULT_INVOCATIONS_ACCEPT", "application/json")
+UTF8_CONTENT_TYPES = ("application/json", "text/csv")
+
+
+def load_script(path):
+    spec = importlib.util.spec_from_file_location("inference", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.path.insert(0, os.path.dirname(path))
+    spec.loader.exec_module(module)
+    return module
+
+
+class RequestContext:
+    """The parts of the model server context inference.py uses"""
+
+    def __init__(self, headers):
+        self.request_headers = {key.lower(): value for key, value in headers.items()}
+        self.response_headers = {}
+
+    def get_request_header(self, idx, key):
+        return self.request_headers.get(key.lower())
+
+    def set_response_header(self, idx, key, value):
+        self.response_headers[key] = value
+
+
+def call_handler(fn, *args, context=None):
+    # The toolkit only passes the context to handlers that take an extra argument
+    if len(inspect.signature(fn).parameters) > len(args):
+        return fn(*args, context)
+    return fn(*args)
+
+
+class InvocationHandler(BaseHTTPRequestHandler):
+    script = None
+    model = None
+
+    def _send(self, status, body, content_type="text/plain", headers=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/ping":
+            self._send(200, "")
+        else:
+            self._send(404, "Not found")
+
+    def do_POST(self):
+        if self.path != "/invocations":
+            self._send(404, "Not found")
+            return
+
+        start = time.perf_counter()
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        content_type = self.headers.get("Content-Type", "application/json")
+        accept = self.headers.get("Accept")
+        if not accept or accept == "*/*":
+            accept = DEFAULT_ACCEPT
+        if content_type in UTF8_CONTENT_TYPES:
+            body = body.decode("utf-8")
+
+        context = RequestContext(self.headers)
+        try:
+            data = call_handler(self.script.input_fn, body, content_type, context=context)
+            prediction = call_handler(self.script.predict_fn, data, self.model, context=context)
+            response = call_handler(self.script.output_fn, prediction, accept, context=context)
+        except Exception:
+            traceback.print_exc()
+            self._send(500, traceback.format_exc())
+            return
+
+        self._send(200, response, accept, context.response_headers)
+        print(f"POST /invocations {content_type} -> {accept} {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def log_message(self, format, *args):
+        # Requests are logged by do_POST, keep /ping polling quiet
+        pass
+
+
+def main():
+    script = load_script(args.script)
+    load_start = time.time()
+    model = script.model_fn(args.model_dir)
+    print(f"model_fn finished in {time.time() - load_start:.1f}s")
+
+    InvocationHandler.script = script
+    InvocationHandler.model = model
+    server_class = ThreadingHTTPServer if args.threaded else HTTPServer
+    server = server_class((args.host, args.port), InvocationHandler)
+    print(f"Serving {args.script} on http://{args.host}:{args.port} (/ping, /invocations)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# package_model.py
+# Build the slim serving artifact for an endpoint using serving.dockerfile:
+# only model.pt and code/inference.py, uploaded uncompressed next to the
+# training job's model.tar.gz. There is no requirements.txt, so the container
+# installs nothing at start-up, and SageMaker copies the files straight from
+# S3 instead of downloading and extracting the archive.
+#
+#   python package_model.py --model-data s3://<bucket>/tranining-model/<job>/output/model.tar.gz
+import os
+import sys
+import tarfile
+import argparse
+import tempfile
+import boto3
+
+SERVING_PREFIX = "serving"
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "code")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--model-data",
+        type=str,
+        required=True,
+        help="S3 URI of the training job's output/model.tar.gz",
+    )
+    parser.add_argument(
+        "--code-from-artifact",
+        action="store_true",
+        help="Ship the inference.py stored in model.tar.gz instead of code/inference.py",
+    )
+    return parser.parse_args()
+
+
+def split_s3_uri(uri):
+    bucket, _, key = uri.replace("s3://", "", 1).partition("/")
+    return bucket, key
+
+
+def serving_uri(model_data):
+    """S3 prefix of the slim artifact for a model.tar.gz URI"""
+    return f"{model_data.rsplit('/', 1)[0]}/{SERVING_PREFIX}/"
+
+
+def package_model(model_data, code_from_artifact=False):
+    s3 = boto3.client("s3")
+    bucket, key = split_s3_uri(model_data)
+    target_bucket, target_prefix = split_s3_uri(serving_uri(model_data))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive_path = os.path.join(tmp, "model.tar.gz")
+        print(f"Downloading {model_data}...")
+        s3.download_file(bucket, key, archive_path)
+
+        members = ["model.pt"] + (["code/inference.py"] if code_from_artifact else [])
+        with tarfile.open(archive_path) as archive:
+            names = {m.name.lstrip("./"): m for m in archive.getmembers()}
+            for name in members:
+                if name not in names:
+                    raise FileNotFoundError(f"{name} not found in {model_data}")
+                archive.extract(names[name], tmp)
+
+        files = {
+            "model.pt": os.path.join(tmp, "model.pt"),
+            "code/inference.py": (
+                os.path.join(tmp, "code", "inference.py")
+                if code_from_artifact
+                else os.path.join(CODE_DIR, "inference.py")
+            ),
+        }
+        for name, path in files.items():
+            s3.upload_file(path, target_bucket, target_prefix + name)
+            print(f"Uploaded {name} ({os.path.getsize(path) / 1024**2:.1f} MB)")
+
+    uri = f"s3://{target_bucket}/{target_prefix}"
+    print(f"\nServing artifact: {uri}")
+    return uri
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not args.model_data.endswith("model.tar.gz"):
+        print("Error: --model-data should point at a training job's output/model.tar.gz")
+        sys.exit(1)
+    package_model(args.model_data, args.code_from_artifact)
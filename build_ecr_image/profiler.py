@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import logging
+import torch
+
+try:
+    import pynvml
+except ImportError:
+    pynvml = None
+
+logger = logging.getLogger(__name__)
+
+
+class TrainingProfiler:
+    """Opt-in profiler for YOLO training, driven by ultralytics trainer callbacks.
+
+    Records per-epoch dataloader wait versus compute time and GPU utilization,
+    captures a PyTorch profiler trace for a fixed number of steps, and writes
+    everything to ``output_dir``.
+    """
+
+    def __init__(self, output_dir, profile_steps=20, warmup_steps=5, device_index=0):
+        self.output_dir = output_dir
+        self.profile_steps = profile_steps
+        self.warmup_steps = warmup_steps
+        self.device_index = device_index
+
+        self.epochs = []
+        self._epoch = None
+        self._last_batch_end = None
+        self._batch_start = None
+        self._torch_profiler = None
+        self._profiler_steps = 0
+        self._nvml_handle = None
+
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        if pynvml is not None and torch.cuda.is_available():
+            try:
+                pynvml.nvmlInit()
+                self._nvml_handle = pynvml.nvmlDeviceGetHandleByIndex(device_index)
+            except Exception as e:
+                logger.warning(f"Could not initialise NVML, GPU utilization disabled: {e}")
+        else:
+            logger.warning("pynvml or CUDA not available, GPU utilization disabled")
+
+    def register(self, model):
+        """Attach the profiler callbacks to a YOLO model before ``model.train``"""
+        model.add_callback("on_train_epoch_start", self.on_train_epoch_start)
+        model.add_callback("on_train_batch_start", self.on_train_batch_start)
+        model.add_callback("on_train_batch_end", self.on_train_batch_end)
+        model.add_callback("on_train_epoch_end", self.on_train_epoch_end)
+        model.add_callback("on_train_end", self.on_train_end)
+
+    def _sync(self):
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+
+    def _sample_gpu(self):
+        if self._nvml_handle is None:
+            return
+        try:
+            util = pynvml.nvmlDeviceGetUtilizationRates(self._nvml_handle)
+            mem = pynvml.nvmlDeviceGetMemoryInfo(self._nvml_handle)
+        except Exception:
+            return
+        self._epoch["gpu_util"].append(util.gpu)
+        self._epoch["gpu_mem_used_mb"] = max(
+            self._epoch["gpu_mem_used_mb"], mem.used / 1024**2
+        )
+        self._epoch["gpu_mem_total_mb"] = mem.total / 1024**2
+
+    def _start_torch_profiler(self):
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+
+        self._torch_profiler = torch.profiler.profile(
+            activities=activities,
+            schedule=torch.profiler.schedule(
+                wait=0, warmup=self.warmup_steps, active=self.profile_steps, repeat=1
+            ),
+            on_trace_ready=self._export_trace,
+            record_shapes=True,
+            profile_memory=True,
+        )
+        self._torch_profiler.start()
+        logger.info(
+            f"PyTorch profiler started: {self.warmup_steps} warmup + "
+            f"{self.profile_steps} active steps"
+        )
+
+    def _export_trace(self, prof):
+        trace_path = os.path.join(self.output_dir, "trace.json")
+        prof.export_chrome_trace(trace_path)
+        sort_by = "cuda_time_total" if torch.cuda.is_available() else "cpu_time_total"
+        with open(os.path.join(self.output_dir, "key_averages.txt"), "w") as f:
+            f.write(prof.key_averages().table(sort_by=sort_by, row_limit=50))
+        logger.info(f"PyTorch profiler trace saved to {trace_path}")
+
+    def _stop_torch_profiler(self):
+        if self._torch_profiler is not None:
+            self._torch_profiler.stop()
+            self._torch_profiler = None
+
+    def on_train_epoch_start(self, trainer):
+        self._epoch = {
+            "epoch": trainer.epoch + 1,
+            "batches": 0,
+            "images": 0,
+            "data_wait_s": 0.0,
+            "compute_s": 0.0,
+            "gpu_util": [],
+            "gpu_mem_used_mb": 0.0,
+            "gpu_mem_total_mb": None,
+            "started_at": time.time(),
+        }
+        self._last_batch_end = time.perf_counter()
+
+        if not self.epochs and self._torch_profiler is None and self.profile_steps > 0:
+            self._start_torch_profiler()
+
+    def on_train_batch_start(self, trainer):
+        self._batch_start = time.perf_counter()
+        self._epoch["data_wait_s"] += self._batch_start - self._last_batch_end
+
+    def on_train_batch_end(self, trainer):
+        self._sync()
+        now = time.perf_counter()
+        self._epoch["compute_s"] += now - self._batch_start
+        self._epoch["batches"] += 1
+        self._epoch["images"] += trainer.batch_size
+        self._sample_gpu()
+
+        if self._torch_profiler is not None:
+            self._torch_profiler.step()
+            self._profiler_steps += 1
+            if self._profiler_steps >= self.warmup_steps + self.profile_steps:
+                self._stop_torch_profiler()
+
+        self._last_batch_end = time.perf_counter()
+
+    def on_train_epoch_end(self, trainer):
+        epoch = self._epoch
+        gpu_util = epoch.pop("gpu_util")
+        step_s = epoch["data_wait_s"] + epoch["compute_s"]
+
+        epoch["duration_s"] = time.time() - epoch.pop("started_at")
+        epoch["data_wait_fraction"] = epoch["data_wait_s"] / step_s if step_s else 0.0
+        epoch["images_per_s"] = epoch["images"] / step_s if step_s else 0.0
+        epoch["gpu_util_mean"] = sum(gpu_util) / len(gpu_util) if gpu_util else None
+        self.epochs.append(epoch)
+
+        logger.info(
+            f"[profile] epoch {epoch['epoch']}: data wait {epoch['data_wait_s']:.1f}s "
+            f"({epoch['data_wait_fraction']:.0%}), compute {epoch['compute_s']:.1f}s, "
+            f"GPU util {epoch['gpu_util_mean']}%, {epoch['images_per_s']:.1f} img/s"
+        )
+
+        with open(os.path.join(self.output_dir, "epochs.json"), "w") as f:
+            json.dump(self.epochs, f, indent=2)
+
+    def on_train_end(self, trainer):
+        self._stop_torch_profiler()
+        summary = self.summary(workers=trainer.args.workers, batch=trainer.batch_size)
+
+        with open(os.path.join(self.output_dir, "summary.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+
+        logger.info("=" * 50)
+        logger.info("Training profile summary")
+        logger.info("=" * 50)
+        for key, value in summary.items():
+            logger.info(f"  {key}: {value}")
+
+        if self._nvml_handle is not None:
+            pynvml.nvmlShutdown()
+
+    def summary(self, workers, batch):
+        """Aggregate the recorded epochs and suggest dataloader workers / batch size"""
+        data_wait_s = sum(e["data_wait_s"] for e in self.epochs)
+        compute_s = sum(e["compute_s"] for e in self.epochs)
+        step_s = data_wait_s + compute_s
+        wait_fraction = data_wait_s / step_s if step_s else 0.0
+
+        gpu_utils = [e["gpu_util_mean"] for e in self.epochs if e["gpu_util_mean"] is not None]
+        gpu_util = sum(gpu_utils) / len(gpu_utils) if gpu_utils else None
+
+        mem_used = max((e["gpu_mem_used_mb"] for e in self.epochs), default=0.0)
+        mem_total = next(
+            (e["gpu_mem_total_mb"] for e in self.epochs if e["gpu_mem_total_mb"]), None
+        )
+        mem_fraction = mem_used / mem_total if mem_total else None
+
+        suggested_workers, suggested_batch, reasons = workers, batch, []
+        cpu_count = os.cpu_count() or 1
+
+        if wait_fraction > 0.2:
+            if workers < cpu_count:
+                suggested_workers = min(cpu_count, max(workers * 2, workers + 2))
+                reasons.append(
+                    f"dataloader wait is {wait_fraction:.0%} of step time, "
+                    f"raise workers towards {suggested_workers}"
+                )
+            else:
+                reasons.append(
+                    f"dataloader wait is {wait_fraction:.0%} of step time with all "
+                    f"{cpu_count} CPUs in use, use an instance with more vCPUs or cache=ram"
+                )
+        elif gpu_util is not None and gpu_util < 70 and mem_fraction and mem_fraction < 0.6:
+            suggested_batch = max(batch + 1, int(batch * 0.85 / mem_fraction))
+            reasons.append(
+                f"GPU is {gpu_util:.0f}% busy using {mem_fraction:.0%} of its memory, "
+                f"raise batch towards {suggested_batch}"
+            )
+        else:
+            reasons.append("pipeline looks balanced, keep current settings")
+
+        return {
+            "epochs_profiled": len(self.epochs),
+            "data_wait_s": round(data_wait_s, 2),
+            "compute_s": round(compute_s, 2),
+            "data_wait_fraction": round(wait_fraction, 3),
+            "gpu_util_mean": round(gpu_util, 1) if gpu_util is not None else None,
+            "gpu_mem_used_mb": round(mem_used, 1),
+            "gpu_mem_total_mb": round(mem_total, 1) if mem_total else None,
+            "workers": workers,
+            "batch": batch,
+            "suggested_workers": suggested_workers,
+            "suggested_batch": suggested_batch,
+            "reasons": reasons,
+        }
@@ -0,0 +1,38 @@
+# Entrypoint of the serving image, in place of the DLC's dockerd-entrypoint.py.
+# When the model sets SAGEMAKER_TS_BATCH_SIZE above 1, TorchServe is started
+# with inference.py's own handle() as the handler, which runs a batch of
+# requests through one forward pass. The toolkit's default handler would
+# still predict them one at a time. Otherwise it starts exactly like the DLC.
+import os
+import shlex
+import subprocess
+import sys
+
+from sagemaker_inference import environment
+from sagemaker_pytorch_serving_container import serving, torchserve
+
+
+def batch_size():
+    return int(os.getenv("SAGEMAKER_TS_BATCH_SIZE", "1"))
+
+
+def main():
+    if sys.argv[1:2] != ["serve"]:
+        subprocess.check_call(shlex.split(" ".join(sys.argv[1:])))
+        # Keep the container alive like the DLC entrypoint does
+        subprocess.call(["tail", "-f", "/dev/null"])
+        return
+
+    if batch_size() <= 1:
+        serving.main()
+        return
+
+    # SAGEMAKER_SUBMIT_DIRECTORY is the code directory in /opt/ml/model
+    program = os.getenv("SAGEMAKER_PROGRAM", "inference.py")
+    handler = os.path.join(environment.code_dir, program)
+    print(f"Serving {handler}:handle with batches of up to {batch_size()} requests")
+    torchserve.start_torchserve(handler_service=handler)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,9 +8,13 @@ import argparse
 import shutil
 from pathlib import Path
 import yaml
+import time
 import traceback
 import boto3
 from datetime import datetime
+from profiler import TrainingProfiler
+from autotune import autotune
+from val_cache import CachingDetectionTrainer, build_prediction_cache
 
 logging.basicConfig(
     level=logging.DEBUG,
@@ -19,6 +23,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+PROCESS_START = time.time()
+
+
+def str_to_bool(value):
+    """Parse boolean hyperparameters, SageMaker passes them as strings"""
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("true", "1", "yes", "y")
+
 
 def parse_args():
     parser = argparse.ArgumentParser()
@@ -53,16 +66,32 @@ def parse_args():
     # YOLO training hyperparameters
     parser.add_argument("--epochs", type=int, default=100)
     parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=8)
     parser.add_argument("--imgsz", type=int, default=640)
     parser.add_argument("--learning-rate", type=float, default=0.01)
     parser.add_argument(
         "--device", type=str, default="0" if torch.cuda.is_available() else "cpu"
     )
+    parser.add_argument(
+        "--checkpoint-dir",
+        type=str,
+        default=os.environ.get("SM_CHECKPOINT_DIR", "/opt/ml/checkpoints"),
+    )
     parser.add_argument("--project", type=str, default="/opt/ml/output")
     parser.add_argument("--name", type=str, default="yolo11x")
     parser.add_argument("--exist-ok", type=bool, default=True)
     parser.add_argument("--pretrained", type=bool, default=True)
     parser.add_argument("--resume", type=bool, default=False)
+    # Comma separated conf:iou pairs evaluated from the cached final validation,
+    # the first one is reported as the headline metrics
+    parser.add_argument("--operating-points", type=str, default="0.55:0.75")
+
+    # Profiling
+    parser.add_argument("--profile", type=str_to_bool, default=False)
+    parser.add_argument("--profile-steps", type=int, default=20)
+
+    # Probe batch size and dataloader workers before training
+    parser.add_argument("--autotune", type=str_to_bool, default=False)
 
     return parser.parse_args()
 
@@ -176,6 +205,41 @@ def prepare_dataset(train_path, val_path):
         raise
 
 
+def stream_results(checkpoint_dir):
+    """Callback copying results.csv to the checkpoint directory after every epoch.
+
+    SageMaker continuously syncs the checkpoint directory to CheckpointConfig.S3Uri,
+    which lets the sweep launcher read per-epoch metrics while the job runs.
+    """
+
+    def on_fit_epoch_end(trainer):
+        results_csv = Path(trainer.save_dir) / "results.csv"
+        if results_csv.exists():
+            shutil.copy(str(results_csv), os.path.join(checkpoint_dir, "results.csv"))
+
+    return on_fit_epoch_end
+
+
+def record_startup(checkpoint_dir):
+    """Callbacks writing the first epoch's wall-clock start and end to startup.json.
+
+    The create_training_job Lambda compares these with the job's CreationTime
+    to measure provisioning-to-first-epoch time, e.g. with and without a warm pool.
+    """
+    startup = {"process_start": PROCESS_START}
+
+    def on_train_epoch_start(trainer):
+        startup.setdefault("first_epoch_start", time.time())
+
+    def on_fit_epoch_end(trainer):
+        if "first_epoch_end" not in startup:
+            startup["first_epoch_end"] = time.time()
+            with open(os.path.join(checkpoint_dir, "startup.json"), "w") as f:
+                json.dump(startup, f)
+
+    return on_train_epoch_start, on_fit_epoch_end
+
+
 def train():
     try:
         args = parse_args()
@@ -213,12 +277,39 @@ def train():
 
         logger.info("Model initialized successfully")
 
+        if args.profile:
+            profile_dir = os.path.join(args.output_data_dir, "profile")
+            logger.info(f"Profiling enabled, results will be written to {profile_dir}")
+            profiler = TrainingProfiler(profile_dir, profile_steps=args.profile_steps)
+            profiler.register(model)
+
+        if os.path.isdir(args.checkpoint_dir):
+            logger.info(f"Streaming results.csv to {args.checkpoint_dir}")
+            model.add_callback("on_fit_epoch_end", stream_results(args.checkpoint_dir))
+
+            on_epoch_start, on_epoch_end = record_startup(args.checkpoint_dir)
+            model.add_callback("on_train_epoch_start", on_epoch_start)
+            model.add_callback("on_fit_epoch_end", on_epoch_end)
+
+        autotune_results = None
+        batch = args.batch_size
+        if args.autotune:
+            autotune_results = autotune(
+                dataset_yaml,
+                args.imgsz,
+                default_batch_size=args.batch_size,
+                default_workers=args.workers,
+            )
+            batch = autotune_results["batch"]
+            args.workers = autotune_results["workers"]
+
         # Train the model
         logger.info("Starting training...")
         results = model.train(
             data=dataset_yaml,
             epochs=args.epochs,
-            batch=args.batch_size,
+            batch=batch,
+            workers=args.workers,
             imgsz=args.imgsz,
             lr0=args.learning_rate,
             device=args.device,
@@ -227,10 +318,15 @@ def train():
             exist_ok=args.exist_ok,
             resume=args.resume,
             verbose=True,
+            trainer=CachingDetectionTrainer,
         )
 
         logger.info("Training completed!")
 
+        if autotune_results is not None:
+            # The batch size AutoBatch settled on
+            args.batch_size = autotune_results["batch_size"] = model.trainer.batch_size
+
         # Save the best model to the model directory
         best_model_path = Path(args.project) / args.name / "weights" / "best.pt"
         last_model_path = Path(args.project) / args.name / "weights" / "last.pt"
@@ -280,26 +376,43 @@ def train():
                     shutil.copy(str(src_path), dst_path)
                     logger.info(f"Copied {file} to output directory")
 
-        val_metrics = model.val(
-            data=dataset_yaml,
-            project=args.project,
-            name=args.name,
-            imgsz=640,
-            batch=10,
-            conf=0.55,
-            iou=0.75,
-        )  # no arguments needed, dataset and settings remembered
+        # Evaluate operating points from the final validation's cached predictions
+        # instead of running another full model.val pass
+        weights = best_model_path if best_model_path.exists() else last_model_path
+        prediction_cache = build_prediction_cache(
+            model.trainer, dataset_yaml, weights, args.imgsz, args.batch_size
+        )
+
+        operating_points = []
+        for point in args.operating_points.split(","):
+            conf, iou = (float(v) for v in point.split(":"))
+            operating_points.append(prediction_cache.evaluate(conf=conf, iou=iou))
+
+        # PR curves go to their own file to keep metrics.json small
+        pr_curves = []
+        for point in operating_points:
+            pr_curve = point.pop("pr_curve")
+            pr_curves.append({"conf": point["conf"], "iou": point["iou"], **pr_curve})
+
+        with open(os.path.join(args.output_data_dir, "pr_curves.json"), "w") as f:
+            json.dump(pr_curves, f)
+
+        val_metrics = operating_points[0]
 
         # Save training metrics
         metrics = {
             "final_epoch": args.epochs,
             "training_completed": True,
-            "mAP50-95": val_metrics.box.map,
-            "mAP50": val_metrics.box.map50,
-            "mAP75": val_metrics.box.map75,
-            "mAP50-95_all_classes": str(val_metrics.box.maps),
-            "mean_precision_all_classes": val_metrics.box.mp,
-            "mean_recall_all_classes": val_metrics.box.mr,
+            "mAP50-95": val_metrics["mAP50-95"],
+            "mAP50": val_metrics["mAP50"],
+            "mAP75": val_metrics["mAP75"],
+            "mAP50-95_all_classes": str(val_metrics["mAP50-95_all_classes"]),
+            "mean_precision_all_classes": val_metrics["mean_precision_all_classes"],
+            "mean_recall_all_classes": val_metrics["mean_recall_all_classes"],
+            "operating_points": operating_points,
+            "batch_size": args.batch_size,
+            "workers": args.workers,
+            "autotune": autotune_results,
         }
 
         with open(os.path.join(args.output_data_dir, "metrics.json"), "w") as f:
@@ -1,11 +1,24 @@
 # build_and_push.py
 import boto3
 import subprocess
+import argparse
 import sys
 import os
 from datetime import datetime
 from pathlib import Path
 
+# The Deep Learning Containers account table of the endpoint Lambda
+sys.path.insert(
+    0,
+    str(
+        Path(__file__).resolve().parent.parent
+        / "planogram-project-cdk"
+        / "lambda"
+        / "2_create_endpoint"
+    ),
+)
+from dlc_images import dlc_registry  # noqa: E402
+
 
 def get_account_id():
     """Get AWS account ID"""
@@ -36,13 +49,59 @@ def create_ecr_repository(repository_name, region):
         print(f"Created repository {repository_name}")
 
 
-def build_and_push_docker_image():
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--dockerfile",
+        type=str,
+        default="dockerfile",
+        help="dockerfile (training) or serving.dockerfile (endpoint serving image)",
+    )
+    parser.add_argument("--repository", type=str, default="yolo11-training")
+    parser.add_argument(
+        "--build-arg",
+        action="append",
+        default=[],
+        help="Extra docker build argument, e.g. PROCESSOR=gpu. REGION is always set, "
+        "and DLC_REGISTRY when the dockerfile declares it.",
+    )
+    return parser.parse_args()
+
+
+def dockerfile_args(dockerfile):
+    """Names of the ARGs the dockerfile declares"""
+    with open(dockerfile) as f:
+        return {
+            line.split()[1].split("=")[0]
+            for line in f
+            if len(line.split()) > 1 and line.split()[0].upper() == "ARG"
+        }
+
+
+def ecr_base_registries(dockerfile, build_args):
+    """ECR registries the dockerfile pulls its base image from, e.g. the AWS
+    Deep Learning Containers account for serving.dockerfile"""
+    registries = set()
+    with open(dockerfile) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) > 1 and parts[0].upper() == "FROM":
+                image = parts[1]
+                for name, value in build_args.items():
+                    image = image.replace(f"${{{name}}}", value).replace(f"${name}", value)
+                if ".dkr.ecr." in image:
+                    registries.add(image.split("/")[0])
+    return sorted(registries)
+
+
+def build_and_push_docker_image(
+    dockerfile="dockerfile", repository_name="yolo11-training", build_args=()
+):
     """Build and push Docker image to ECR with timestamp tag"""
 
     # Configuration
     account_id = get_account_id()
     region = get_region()
-    repository_name = "yolo11-training"
     timestamp_tag = get_timestamp_tag()
 
     # Create both timestamp and latest tags
@@ -68,9 +127,22 @@ def build_and_push_docker_image():
     login_cmd = f"aws ecr get-login-password --region {region} | docker login --username AWS --password-stdin {account_id}.dkr.ecr.{region}.amazonaws.com"
     subprocess.run(login_cmd, shell=True, check=True)
 
+    build_args = dict(arg.split("=", 1) for arg in [f"REGION={region}", *build_args])
+    if "DLC_REGISTRY" in dockerfile_args(dockerfile):
+        build_args.setdefault("DLC_REGISTRY", dlc_registry(region))
+
+    # The base image may live in another account's registry
+    for registry in ecr_base_registries(dockerfile, build_args):
+        print(f"Logging in to base image registry {registry}...")
+        login_cmd = f"aws ecr get-login-password --region {region} | docker login --username AWS --password-stdin {registry}"
+        subprocess.run(login_cmd, shell=True, check=True)
+
     # Build Docker image
-    print("Building Docker image...")
-    build_cmd = f"docker build -t {repository_name} ."
+    print(f"Building Docker image from {dockerfile}...")
+    build_arg_flags = " ".join(
+        f"--build-arg {name}={value}" for name, value in build_args.items()
+    )
+    build_cmd = f"docker build -f {dockerfile} {build_arg_flags} -t {repository_name} ."
     subprocess.run(build_cmd, shell=True, check=True)
 
     # Tag the image with timestamp
@@ -101,10 +173,14 @@ def build_and_push_docker_image():
 
 
 if __name__ == "__main__":
+    args = parse_args()
+
     # Ensure we're in the right directory
-    if not os.path.exists("Dockerfile"):
-        print("Error: Dockerfile not found in current directory")
-        print("Please run this script from the directory containing the Dockerfile")
+    if not os.path.exists(args.dockerfile):
+        print(f"Error: {args.dockerfile} not found in current directory")
+        print("Please run this script from the directory containing the dockerfile")
         sys.exit(1)
 
-    timestamp_uri, latest_uri = build_and_push_docker_image()
+    timestamp_uri, latest_uri = build_and_push_docker_image(
+        args.dockerfile, args.repository, args.build_arg
+    )
@@ -0,0 +1,197 @@
+import logging
+import numpy as np
+import torch
+import torchvision
+from ultralytics.models.yolo.detect import DetectionTrainer, DetectionValidator
+from ultralytics.utils.metrics import ap_per_class
+from ultralytics.utils.ops import xywh2xyxy
+
+logger = logging.getLogger(__name__)
+
+# IoU thresholds for mAP50-95, same as ultralytics
+IOUV = np.linspace(0.5, 0.95, 10)
+
+
+def match_predictions(pred_boxes, pred_classes, gt_boxes, gt_classes):
+    """Mark which predictions are true positives at each IoU threshold in ``IOUV``"""
+    correct = np.zeros((len(pred_classes), len(IOUV)), dtype=bool)
+    if not len(pred_classes) or not len(gt_classes):
+        return correct
+
+    iou = torchvision.ops.box_iou(
+        torch.from_numpy(gt_boxes), torch.from_numpy(pred_boxes)
+    ).numpy()
+    iou = iou * (gt_classes[:, None] == pred_classes[None, :])
+
+    for i, threshold in enumerate(IOUV):
+        matches = np.array(np.nonzero(iou >= threshold)).T  # (gt, pred) pairs
+        if matches.shape[0]:
+            if matches.shape[0] > 1:
+                # Greedy one-to-one matching, highest IoU first
+                matches = matches[iou[matches[:, 0], matches[:, 1]].argsort()[::-1]]
+                matches = matches[np.unique(matches[:, 1], return_index=True)[1]]
+                matches = matches[np.unique(matches[:, 0], return_index=True)[1]]
+            correct[matches[:, 1].astype(int), i] = True
+    return correct
+
+
+class PredictionCache:
+    """Raw pre-NMS predictions and ground truth from a single validation pass.
+
+    Boxes are kept in the letterboxed input space of the validator, where IoU is
+    the same as in the original image space. ``evaluate`` re-runs only NMS and
+    matching, so any number of conf/iou operating points cost no extra inference.
+    """
+
+    def __init__(self, names, conf_floor):
+        self.names = names
+        self.conf_floor = conf_floor
+        self.images = []
+
+    def add_batch(self, raw_preds, batch):
+        raw_preds = raw_preds.float()
+        height, width = batch["img"].shape[2:]
+        scale = torch.tensor([width, height, width, height], device=raw_preds.device)
+
+        for si in range(raw_preds.shape[0]):
+            x = raw_preds[si].T  # (anchors, 4 + nc)
+            boxes = xywh2xyxy(x[:, :4])
+            scores = x[:, 4:]
+            # Multi-label candidates, as in ultralytics validation
+            i, j = (scores > self.conf_floor).nonzero(as_tuple=False).T
+
+            idx = batch["batch_idx"] == si
+            gt_classes = batch["cls"][idx].squeeze(-1)
+            gt_boxes = xywh2xyxy(batch["bboxes"][idx]) * scale.to(batch["bboxes"].device)
+
+            self.images.append(
+                {
+                    "boxes": boxes[i].cpu().numpy(),
+                    "scores": scores[i, j].cpu().numpy(),
+                    "classes": j.cpu().numpy(),
+                    "gt_boxes": gt_boxes.float().cpu().numpy(),
+                    "gt_classes": gt_classes.cpu().numpy().astype(int),
+                }
+            )
+
+    def __len__(self):
+        return len(self.images)
+
+    def evaluate(self, conf, iou, max_det=300):
+        """Compute box metrics and PR curves at one conf/iou operating point"""
+        tp, pred_conf, pred_cls, target_cls = [], [], [], []
+
+        for image in self.images:
+            keep = image["scores"] > conf
+            boxes = image["boxes"][keep]
+            scores = image["scores"][keep]
+            classes = image["classes"][keep]
+
+            if len(scores):
+                kept = torchvision.ops.batched_nms(
+                    torch.from_numpy(boxes),
+                    torch.from_numpy(scores),
+                    torch.from_numpy(classes),
+                    iou,
+                )[:max_det].numpy()
+                boxes, scores, classes = boxes[kept], scores[kept], classes[kept]
+
+            tp.append(
+                match_predictions(boxes, classes, image["gt_boxes"], image["gt_classes"])
+            )
+            pred_conf.append(scores)
+            pred_cls.append(classes)
+            target_cls.append(image["gt_classes"])
+
+        (_, _, p, r, _, ap, ap_classes, _, _, _, recall, precision) = ap_per_class(
+            np.concatenate(tp),
+            np.concatenate(pred_conf),
+            np.concatenate(pred_cls),
+            np.concatenate(target_cls),
+            plot=False,
+            names=self.names,
+        )
+
+        has_ap = len(ap) > 0
+        ap50_95 = ap.mean(1) if has_ap else np.zeros(0)
+        map50_95 = float(ap.mean()) if has_ap else 0.0
+        maps = np.zeros(len(self.names)) + map50_95
+        for i, c in enumerate(ap_classes):
+            maps[c] = ap50_95[i]
+
+        # 101-point PR curve at IoU 0.5 per class, enough to plot
+        points = np.linspace(0, len(recall) - 1, 101).astype(int)
+        return {
+            "conf": conf,
+            "iou": iou,
+            "mAP50-95": map50_95,
+            "mAP50": float(ap[:, 0].mean()) if has_ap else 0.0,
+            "mAP75": float(ap[:, 5].mean()) if has_ap else 0.0,
+            "mAP50-95_all_classes": maps.tolist(),
+            "mean_precision_all_classes": float(p.mean()) if has_ap else 0.0,
+            "mean_recall_all_classes": float(r.mean()) if has_ap else 0.0,
+            "pr_curve": {
+                "recall": recall[points].round(4).tolist(),
+                "precision": {
+                    self.names[int(c)]: precision[i][points].round(4).tolist()
+                    for i, c in enumerate(ap_classes)
+                },
+            },
+        }
+
+
+class CachingDetectionValidator(DetectionValidator):
+    """DetectionValidator that also fills a PredictionCache.
+
+    Only standalone runs are cached (the trainer's final evaluation of best.pt),
+    not the per-epoch validations during training.
+    """
+
+    prediction_cache = None
+
+    def init_metrics(self, model):
+        super().init_metrics(model)
+        self._raw_preds = None
+        self.prediction_cache = (
+            None if self.training else PredictionCache(self.names, self.args.conf)
+        )
+
+    def postprocess(self, preds):
+        if self.prediction_cache is not None:
+            self._raw_preds = (preds[0] if isinstance(preds, (list, tuple)) else preds).detach()
+        return super().postprocess(preds)
+
+    def update_metrics(self, preds, batch):
+        super().update_metrics(preds, batch)
+        if self.prediction_cache is not None:
+            self.prediction_cache.add_batch(self._raw_preds, batch)
+
+
+class CachingDetectionTrainer(DetectionTrainer):
+    """DetectionTrainer whose validator caches the final evaluation's predictions"""
+
+    def get_validator(self):
+        validator = super().get_validator()
+        return CachingDetectionValidator(
+            dataloader=validator.dataloader,
+            save_dir=validator.save_dir,
+            args=validator.args,
+            _callbacks=validator.callbacks,
+        )
+
+
+def build_prediction_cache(trainer, dataset_yaml, weights, imgsz, batch):
+    """Return the cache filled by the trainer's final evaluation, or run a single
+    caching validation pass over ``weights`` if training ended without one"""
+    validator = getattr(trainer, "validator", None)
+    cache = getattr(validator, "prediction_cache", None)
+    if cache:
+        logger.info(f"Reusing final validation predictions for {len(cache)} images")
+        return cache
+
+    logger.info("No cached final validation, running one validation pass")
+    validator = CachingDetectionValidator(
+        args={"data": dataset_yaml, "imgsz": imgsz, "batch": batch, "mode": "val"}
+    )
+    validator(model=str(weights))
+    return validator.prediction_cache
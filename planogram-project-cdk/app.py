@@ -85,7 +85,6 @@ create_endpoint_lambda_stack = CreateEndpointLambdaCdkStack(
     app,
     "CreateEndpointLambdaCdkStack",
     config=config,
-    lambda_layers_stack=lambda_layers_stack,
     env=env,
     s3_bucket_stack=s3_bucket_stack,
 )
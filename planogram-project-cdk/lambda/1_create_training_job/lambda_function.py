@@ -3,11 +3,14 @@ import boto3
 import os
 from datetime import datetime
 import logging
+from training_job import build_training_job_config, describe_startup
+from sweep import start_sweep, step_sweep
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 sagemaker = boto3.client("sagemaker")
+s3 = boto3.client("s3")
 
 
 def lambda_handler(event, context):
@@ -24,11 +27,44 @@ def lambda_handler(event, context):
             "epochs": 100,
             "batch-size": 16,
             "learning-rate": 0.01,
-            "imgsz": 640
+            "imgsz": 640,
+            "autotune": true
+        },
+        "keep_alive_seconds": 900
+    }
+
+    "keep_alive_seconds" keeps the instance in a SageMaker warm pool after the
+    job ends, so the next job with the same instance type starts without
+    provisioning. Sweeps use a warm pool by default.
+
+    Startup timing: invoke with {"training_job_name": "yolo11x-..."} to get
+    the provisioning and creation-to-first-epoch time of a job.
+
+    Hyperparameter sweep: add a "sweep" block. The first call launches up to
+    "max_concurrent" jobs and returns "sweep_state"; invoke again with
+    {"sweep_state": <returned state>} to poll, stop losing jobs early and
+    launch the rest, until its "status" is "Completed".
+    {
+        ...,
+        "sweep": {
+            "max_jobs": 8,
+            "max_concurrent": 2,
+            "min_epochs": 10,
+            "metric": "metrics/mAP50-95(B)",
+            "parameters": {
+                "learning-rate": {"min": 0.001, "max": 0.02, "scale": "log"},
+                "imgsz": [640, 800],
+                "epochs": [100, 200]
+            }
         }
     }
     """
 
+    if "sweep" in event or "sweep_state" in event:
+        return sweep_handler(event)
+    if "training_job_name" in event:
+        return startup_handler(event)
+
     try:
         training_data = event.get("training_data_s3")
         validation_data = event.get("validation_data_s3")
@@ -39,67 +75,17 @@ def lambda_handler(event, context):
         if not all([training_data, validation_data, output_path]):
             raise ValueError("Missing required S3 paths")
 
-        role_arn = os.getenv("SAGEMAKER_ROLE_ARN")
-        ecr_image = os.getenv("ECR_IMAGE_URI")
-        # role_arn = f"arn:aws:iam::151182331915:role/training_job_role"
-        # ecr_image = (
-        #     f"151182331915.dkr.ecr.ap-southeast-1.amazonaws.com/yolo11-training:latest"
-        # )
-
         job_name = f"yolo11x-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
 
-        default_hyperparameters = {
-            "epochs": "200",
-            "batch-size": "10",
-            "imgsz": "640",
-            "learning-rate": "0.01",
-            "device": "0",
-        }
-
-        # Merge with provided hyperparameters
-        for key, value in hyperparameters.items():
-            default_hyperparameters[key] = str(value)
-
-        training_job_config = {
-            "TrainingJobName": job_name,
-            "RoleArn": role_arn,
-            "AlgorithmSpecification": {
-                "TrainingImage": ecr_image,
-                "TrainingInputMode": "File",
-            },
-            "InputDataConfig": [
-                {
-                    "ChannelName": "train",
-                    "DataSource": {
-                        "S3DataSource": {
-                            "S3DataType": "S3Prefix",
-                            "S3Uri": training_data,
-                            "S3DataDistributionType": "FullyReplicated",
-                        }
-                    },
-                    "ContentType": "application/x-image",
-                },
-                {
-                    "ChannelName": "validation",
-                    "DataSource": {
-                        "S3DataSource": {
-                            "S3DataType": "S3Prefix",
-                            "S3Uri": validation_data,
-                            "S3DataDistributionType": "FullyReplicated",
-                        }
-                    },
-                    "ContentType": "application/x-image",
-                },
-            ],
-            "OutputDataConfig": {"S3OutputPath": output_path},
-            "ResourceConfig": {
-                "InstanceType": instance_type,  # GPU instance for YOLO training
-                "InstanceCount": 1,
-                "VolumeSizeInGB": 20,
-            },
-            "StoppingCondition": {"MaxRuntimeInSeconds": 86400},  # 24 hours
-            "HyperParameters": default_hyperparameters,
-        }
+        training_job_config = build_training_job_config(
+            job_name,
+            training_data,
+            validation_data,
+            output_path,
+            instance_type,
+            hyperparameters,
+            keep_alive_seconds=event.get("keep_alive_seconds", 0),
+        )
 
         response = sagemaker.create_training_job(**training_job_config)
 
@@ -112,6 +98,9 @@ def lambda_handler(event, context):
                     "message": "Training job created successfully",
                     "trainingJobName": job_name,
                     "trainingJobArn": response["TrainingJobArn"],
+                    "keepAlivePeriodInSeconds": training_job_config[
+                        "ResourceConfig"
+                    ].get("KeepAlivePeriodInSeconds", 0),
                 }
             ),
         }
@@ -119,3 +108,57 @@ def lambda_handler(event, context):
     except Exception as e:
         logger.error(f"Error creating training job: {str(e)}")
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+
+
+def sweep_handler(event):
+    try:
+        state = event.get("sweep_state")
+        if state is None:
+            if not all(
+                [
+                    event.get("training_data_s3"),
+                    event.get("validation_data_s3"),
+                    event.get("output_s3"),
+                ]
+            ):
+                raise ValueError("Missing required S3 paths")
+            state = start_sweep(event)
+
+        state = step_sweep(state, sagemaker, s3)
+
+        return {
+            "statusCode": 200,
+            "body": json.dumps(
+                {
+                    "message": f"Sweep {state['status']}",
+                    "sweepName": state["sweep_name"],
+                    "best": state["best"],
+                    "sweep_state": state,
+                }
+            ),
+        }
+
+    except Exception as e:
+        logger.error(f"Error running sweep: {str(e)}")
+        return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+
+
+def startup_handler(event):
+    try:
+        job_name = event["training_job_name"]
+        job = sagemaker.describe_training_job(TrainingJobName=job_name)
+
+        return {
+            "statusCode": 200,
+            "body": json.dumps(
+                {
+                    "trainingJobName": job_name,
+                    "trainingJobStatus": job["TrainingJobStatus"],
+                    "startup": describe_startup(job, s3),
+                }
+            ),
+        }
+
+    except Exception as e:
+        logger.error(f"Error describing training job: {str(e)}")
+        return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
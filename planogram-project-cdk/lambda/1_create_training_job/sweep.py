@@ -0,0 +1,222 @@
+import csv
+import io
+import math
+import time
+import random
+import logging
+import itertools
+from datetime import datetime
+from statistics import median
+
+from training_job import (
+    DEFAULT_SWEEP_KEEP_ALIVE_SECONDS,
+    build_training_job_config,
+    checkpoint_s3_uri,
+    describe_startup,
+    split_s3_uri,
+)
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+DEFAULT_METRIC = "metrics/mAP50-95(B)"
+SWEEP_PARAMETERS = ("learning-rate", "imgsz", "epochs")
+TERMINAL_STATUSES = ("Completed", "Failed", "Stopped")
+
+
+def _sample(spec, rng, name):
+    """Draw one value from a {"min", "max", "scale"} range"""
+    low, high = spec["min"], spec["max"]
+    if spec.get("scale") == "log":
+        value = math.exp(rng.uniform(math.log(low), math.log(high)))
+    else:
+        value = rng.uniform(low, high)
+    if name in ("imgsz", "epochs"):
+        # imgsz must be a multiple of the model stride
+        step = 32 if name == "imgsz" else 1
+        return int(round(value / step) * step)
+    return round(value, 6)
+
+
+def generate_trials(parameters, max_jobs, seed=0):
+    """Expand sweep ranges into at most ``max_jobs`` hyperparameter sets.
+
+    Each parameter is either a list of values (grid) or a range
+    ``{"min": ..., "max": ..., "scale": "linear" | "log"}`` (random search).
+    """
+    unknown = set(parameters) - set(SWEEP_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unsupported sweep parameters: {sorted(unknown)}")
+
+    rng = random.Random(seed)
+    grid = {k: v for k, v in parameters.items() if isinstance(v, list)}
+    ranges = {k: v for k, v in parameters.items() if isinstance(v, dict)}
+
+    if grid and not ranges:
+        combinations = list(itertools.product(*grid.values()))
+        rng.shuffle(combinations)
+        return [dict(zip(grid, c)) for c in combinations[:max_jobs]]
+
+    trials = []
+    for _ in range(max_jobs):
+        trial = {k: rng.choice(v) for k, v in grid.items()}
+        trial.update({k: _sample(v, rng, k) for k, v in ranges.items()})
+        trials.append(trial)
+    return trials
+
+
+def read_metric_history(s3_client, checkpoint_uri, metric):
+    """Read the per-epoch ``metric`` values streamed to the job's results.csv"""
+    bucket, prefix = split_s3_uri(checkpoint_uri)
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=f"{prefix}/results.csv")
+    except s3_client.exceptions.NoSuchKey:
+        return []
+
+    body = response["Body"].read().decode("utf-8")
+    rows = csv.DictReader(io.StringIO(body))
+    history = []
+    for row in rows:
+        # Older ultralytics versions pad the column names with spaces
+        row = {k.strip(): v for k, v in row.items() if k}
+        if row.get(metric) not in (None, ""):
+            history.append(float(row[metric]))
+    return history
+
+
+def should_stop(trial, trials, min_epochs, min_peers=2):
+    """Median stopping rule: stop a trial whose best metric so far is below the
+    median of its peers' best metric at the same epoch"""
+    history = trial["history"]
+    epoch = len(history)
+    # Nothing to compare before the first epoch, whatever min_epochs says
+    if epoch < max(min_epochs, 1):
+        return False
+
+    peers = [
+        max(t["history"][:epoch])
+        for t in trials
+        if t is not trial and len(t["history"]) >= epoch
+    ]
+    if len(peers) < min_peers:
+        return False
+
+    return max(history) < median(peers)
+
+
+def start_sweep(event):
+    """Build the initial sweep state from a create_training_job event"""
+    sweep = event["sweep"]
+    max_jobs = int(sweep.get("max_jobs", 4))
+    min_epochs = int(sweep.get("min_epochs", 10))
+    if min_epochs < 1:
+        raise ValueError(f"sweep.min_epochs must be at least 1, got {min_epochs}")
+    trials = generate_trials(sweep["parameters"], max_jobs, sweep.get("seed", 0))
+    sweep_name = f"yolo11x-sweep-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+
+    return {
+        "sweep_name": sweep_name,
+        "training_data_s3": event.get("training_data_s3"),
+        "validation_data_s3": event.get("validation_data_s3"),
+        "output_s3": event.get("output_s3"),
+        "instance_type": event.get("instance_type"),
+        "hyperparameters": event.get("hyperparameters", {}),
+        "max_concurrent": int(sweep.get("max_concurrent", 2)),
+        "metric": sweep.get("metric", DEFAULT_METRIC),
+        "min_epochs": min_epochs,
+        "keep_alive_seconds": int(
+            event.get("keep_alive_seconds", DEFAULT_SWEEP_KEEP_ALIVE_SECONDS)
+        ),
+        "status": "InProgress",
+        "best": None,
+        "trials": [
+            {
+                "job_name": f"{sweep_name}-{i:02d}",
+                "hyperparameters": trial,
+                "status": "Pending",
+                "history": [],
+                "stopped_early": False,
+                "startup": None,
+            }
+            for i, trial in enumerate(trials)
+        ],
+    }
+
+
+def step_sweep(state, sagemaker_client, s3_client):
+    """Advance a sweep by one poll: refresh running jobs, stop losers early and
+    launch pending jobs up to the concurrency cap. Safe to call repeatedly."""
+    trials = state["trials"]
+
+    for trial in trials:
+        if trial["status"] in ("Pending",) + TERMINAL_STATUSES:
+            continue
+
+        job = sagemaker_client.describe_training_job(TrainingJobName=trial["job_name"])
+        trial["status"] = job["TrainingJobStatus"]
+        trial["history"] = read_metric_history(
+            s3_client,
+            checkpoint_s3_uri(state["output_s3"], trial["job_name"]),
+            state["metric"],
+        )
+        if not (trial["startup"] or {}).get("to_first_epoch_seconds"):
+            trial["startup"] = describe_startup(job, s3_client)
+
+    # Decide on early stopping only once every trial's history is fresh
+    for trial in trials:
+        if trial["status"] == "InProgress" and should_stop(
+            trial, trials, state["min_epochs"]
+        ):
+            logger.info(
+                f"Stopping {trial['job_name']} early at epoch {len(trial['history'])}"
+            )
+            sagemaker_client.stop_training_job(TrainingJobName=trial["job_name"])
+            trial["status"] = "Stopping"
+            trial["stopped_early"] = True
+
+    running = [t for t in trials if t["status"] in ("InProgress", "Stopping")]
+    for trial in trials:
+        if len(running) >= state["max_concurrent"]:
+            break
+        if trial["status"] != "Pending":
+            continue
+
+        config = build_training_job_config(
+            trial["job_name"],
+            state["training_data_s3"],
+            state["validation_data_s3"],
+            state["output_s3"],
+            state["instance_type"],
+            {**state["hyperparameters"], **trial["hyperparameters"]},
+            keep_alive_seconds=state["keep_alive_seconds"],
+        )
+        sagemaker_client.create_training_job(**config)
+        logger.info(f"Sweep job created: {trial['job_name']} {trial['hyperparameters']}")
+        trial["status"] = "InProgress"
+        running.append(trial)
+
+    scored = [t for t in trials if t["history"]]
+    if scored:
+        best = max(scored, key=lambda t: max(t["history"]))
+        state["best"] = {
+            "job_name": best["job_name"],
+            "hyperparameters": best["hyperparameters"],
+            "metric": state["metric"],
+            "value": max(best["history"]),
+        }
+
+    if all(t["status"] in TERMINAL_STATUSES for t in trials):
+        state["status"] = "Completed"
+        logger.info(f"Sweep {state['sweep_name']} completed, best: {state['best']}")
+
+    return state
+
+
+def run_sweep(event, sagemaker_client, s3_client, poll_seconds=60):
+    """Run a sweep to completion, for use outside Lambda's time limit"""
+    state = start_sweep(event)
+    while True:
+        state = step_sweep(state, sagemaker_client, s3_client)
+        if state["status"] == "Completed":
+            return state
+        time.sleep(poll_seconds)
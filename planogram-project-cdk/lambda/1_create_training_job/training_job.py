@@ -0,0 +1,146 @@
+import os
+import json
+
+DEFAULT_HYPERPARAMETERS = {
+    "epochs": "200",
+    "batch-size": "10",
+    "imgsz": "640",
+    "learning-rate": "0.01",
+    "device": "0",
+}
+
+# train.py copies results.csv here after every epoch, SageMaker keeps it in
+# sync with CheckpointConfig.S3Uri while the job runs
+CHECKPOINT_LOCAL_PATH = "/opt/ml/checkpoints"
+
+# Keep the instance of a finished job alive so the next job with the same
+# ResourceConfig (sweeps, fine-tunes) skips provisioning and image pull
+DEFAULT_SWEEP_KEEP_ALIVE_SECONDS = 900
+MAX_KEEP_ALIVE_SECONDS = 3600
+
+
+def split_s3_uri(uri):
+    bucket, _, key = uri.replace("s3://", "", 1).partition("/")
+    return bucket, key
+
+
+def checkpoint_s3_uri(output_path, job_name):
+    """S3 prefix where a training job streams its checkpoint directory"""
+    return f"{output_path.rstrip('/')}/{job_name}/checkpoints"
+
+
+def merge_hyperparameters(hyperparameters):
+    """Merge user hyperparameters over the defaults, SageMaker wants string values"""
+    merged = dict(DEFAULT_HYPERPARAMETERS)
+    for key, value in hyperparameters.items():
+        merged[key] = str(value)
+    return merged
+
+
+def build_training_job_config(
+    job_name,
+    training_data,
+    validation_data,
+    output_path,
+    instance_type,
+    hyperparameters,
+    keep_alive_seconds=0,
+):
+    """Build the CreateTrainingJob request for a YOLO11x training job"""
+    role_arn = os.getenv("SAGEMAKER_ROLE_ARN")
+    ecr_image = os.getenv("ECR_IMAGE_URI")
+
+    resource_config = {
+        "InstanceType": instance_type,  # GPU instance for YOLO training
+        "InstanceCount": 1,
+        "VolumeSizeInGB": 20,
+    }
+    if keep_alive_seconds:
+        # Warm pool: jobs with an identical ResourceConfig reuse the instance
+        resource_config["KeepAlivePeriodInSeconds"] = min(
+            int(keep_alive_seconds), MAX_KEEP_ALIVE_SECONDS
+        )
+
+    return {
+        "TrainingJobName": job_name,
+        "RoleArn": role_arn,
+        "AlgorithmSpecification": {
+            "TrainingImage": ecr_image,
+            "TrainingInputMode": "File",
+        },
+        "InputDataConfig": [
+            {
+                "ChannelName": "train",
+                "DataSource": {
+                    "S3DataSource": {
+                        "S3DataType": "S3Prefix",
+                        "S3Uri": training_data,
+                        "S3DataDistributionType": "FullyReplicated",
+                    }
+                },
+                "ContentType": "application/x-image",
+            },
+            {
+                "ChannelName": "validation",
+                "DataSource": {
+                    "S3DataSource": {
+                        "S3DataType": "S3Prefix",
+                        "S3Uri": validation_data,
+                        "S3DataDistributionType": "FullyReplicated",
+                    }
+                },
+                "ContentType": "application/x-image",
+            },
+        ],
+        "OutputDataConfig": {"S3OutputPath": output_path},
+        "ResourceConfig": resource_config,
+        "CheckpointConfig": {
+            "S3Uri": checkpoint_s3_uri(output_path, job_name),
+            "LocalPath": CHECKPOINT_LOCAL_PATH,
+        },
+        "StoppingCondition": {"MaxRuntimeInSeconds": 86400},  # 24 hours
+        "HyperParameters": merge_hyperparameters(hyperparameters),
+    }
+
+
+def describe_startup(job, s3_client):
+    """Measure how long a training job took from creation to its first epoch.
+
+    ``job`` is a DescribeTrainingJob response. The first-epoch timestamps come
+    from startup.json, which train.py writes to the checkpoint directory.
+    Returns None until the job has started training.
+    """
+    created = job["CreationTime"]
+    training_start = job.get("TrainingStartTime")
+    if training_start is None:
+        return None
+
+    warm_pool = job.get("WarmPoolStatus", {})
+    startup = {
+        "provisioning_seconds": round((training_start - created).total_seconds(), 1),
+        "to_first_epoch_seconds": None,
+        "first_epoch_seconds": None,
+        "keep_alive_seconds": job["ResourceConfig"].get("KeepAlivePeriodInSeconds"),
+        "warm_pool_status": warm_pool.get("Status"),
+        "warm_pool_reused_by_job": warm_pool.get("ReusedByJob"),
+    }
+
+    checkpoint_uri = job.get("CheckpointConfig", {}).get("S3Uri")
+    if checkpoint_uri:
+        bucket, prefix = split_s3_uri(checkpoint_uri)
+        try:
+            response = s3_client.get_object(Bucket=bucket, Key=f"{prefix}/startup.json")
+            timestamps = json.loads(response["Body"].read())
+        except s3_client.exceptions.NoSuchKey:
+            timestamps = {}
+
+        if "first_epoch_start" in timestamps:
+            startup["to_first_epoch_seconds"] = round(
+                timestamps["first_epoch_start"] - created.timestamp(), 1
+            )
+        if "first_epoch_end" in timestamps and "first_epoch_start" in timestamps:
+            startup["first_epoch_seconds"] = round(
+                timestamps["first_epoch_end"] - timestamps["first_epoch_start"], 1
+            )
+
+    return startup
@@ -0,0 +1,197 @@
+# {
+#   "autoscaling": {
+#     "min_capacity": 1,
+#     "max_capacity": 4,
+#     "target_invocations_per_instance": 30,
+#     "scale_in_cooldown": 600,
+#     "scale_out_cooldown": 60,
+#     "schedule": {
+#       "timezone": "Asia/Ho_Chi_Minh",
+#       "scale_down_cron": "cron(0 22 * * ? *)",
+#       "scale_up_cron": "cron(0 6 * * ? *)",
+#       "night_max_capacity": 1
+#     }
+#   }
+# }
+DEFAULT_AUTOSCALING = {
+    "min_capacity": 1,
+    "max_capacity": 4,
+    # SageMakerVariantInvocationsPerInstance is a per-minute count
+    "target_invocations_per_instance": 30,
+    # Async endpoints track the queued requests per instance instead
+    "target_backlog_per_instance": 5,
+    "scale_in_cooldown": 600,
+    "scale_out_cooldown": 60,
+    "schedule": None,
+}
+SCALABLE_DIMENSION = "sagemaker:variant:DesiredInstanceCount"
+
+
+def autoscaling_settings(event):
+    """Merge the event's "autoscaling" block over the defaults, None if absent"""
+    settings = event.get("autoscaling")
+    if not settings:
+        return None
+    merged = dict(DEFAULT_AUTOSCALING)
+    merged.update(settings)
+    return merged
+
+
+def variant_resource_id(endpoint_name, variant_name="AllTraffic"):
+    return f"endpoint/{endpoint_name}/variant/{variant_name}"
+
+
+def configure_autoscaling(
+    endpoint_name,
+    settings,
+    autoscaling_client,
+    cloudwatch_client,
+    mode="realtime",
+    variant_name="AllTraffic",
+):
+    """Register the endpoint variant with Application Auto Scaling and attach
+    target tracking, plus the scheduled night scale-down if configured.
+
+    Real-time endpoints track invocations per instance and keep at least one
+    instance. Async endpoints may scale to zero: they track the backlog per
+    instance and a step policy on HasBacklogWithoutCapacity brings the first
+    instance back when requests arrive.
+    """
+    client = autoscaling_client
+    resource_id = variant_resource_id(endpoint_name, variant_name)
+    min_capacity = int(settings["min_capacity"])
+    if mode != "async":
+        min_capacity = max(min_capacity, 1)
+
+    client.register_scalable_target(
+        ServiceNamespace="sagemaker",
+        ResourceId=resource_id,
+        ScalableDimension=SCALABLE_DIMENSION,
+        MinCapacity=min_capacity,
+        MaxCapacity=int(settings["max_capacity"]),
+    )
+
+    if mode == "async":
+        metric = {
+            "CustomizedMetricSpecification": {
+                "MetricName": "ApproximateBacklogSizePerInstance",
+                "Namespace": "AWS/SageMaker",
+                "Dimensions": [{"Name": "EndpointName", "Value": endpoint_name}],
+                "Statistic": "Average",
+            },
+            "TargetValue": float(settings["target_backlog_per_instance"]),
+        }
+    else:
+        metric = {
+            "PredefinedMetricSpecification": {
+                "PredefinedMetricType": "SageMakerVariantInvocationsPerInstance",
+            },
+            "TargetValue": float(settings["target_invocations_per_instance"]),
+        }
+
+    client.put_scaling_policy(
+        PolicyName=f"{endpoint_name}-target-tracking",
+        ServiceNamespace="sagemaker",
+        ResourceId=resource_id,
+        ScalableDimension=SCALABLE_DIMENSION,
+        PolicyType="TargetTrackingScaling",
+        TargetTrackingScalingPolicyConfiguration={
+            **metric,
+            "ScaleInCooldown": int(settings["scale_in_cooldown"]),
+            "ScaleOutCooldown": int(settings["scale_out_cooldown"]),
+        },
+    )
+
+    schedule = settings.get("schedule")
+    night_min = night_min_capacity(schedule, min_capacity, mode) if schedule else None
+
+    # Also needed when only the night schedule goes down to zero
+    if mode == "async" and 0 in (min_capacity, night_min):
+        _configure_scale_from_zero(client, cloudwatch_client, endpoint_name, resource_id)
+
+    if schedule:
+        _configure_schedule(
+            client, endpoint_name, resource_id, settings, min_capacity, night_min
+        )
+
+    print(
+        f"Autoscaling {resource_id}: {min_capacity}-{settings['max_capacity']} instances ({mode})"
+    )
+    return {
+        "resource_id": resource_id,
+        "min_capacity": min_capacity,
+        "max_capacity": int(settings["max_capacity"]),
+        "schedule": settings.get("schedule"),
+    }
+
+
+def _configure_scale_from_zero(client, cloudwatch_client, endpoint_name, resource_id):
+    # Target tracking can't leave zero instances (the backlog per instance is
+    # undefined), a step policy on HasBacklogWithoutCapacity starts the first one
+    policy = client.put_scaling_policy(
+        PolicyName=f"{endpoint_name}-scale-from-zero",
+        ServiceNamespace="sagemaker",
+        ResourceId=resource_id,
+        ScalableDimension=SCALABLE_DIMENSION,
+        PolicyType="StepScaling",
+        StepScalingPolicyConfiguration={
+            "AdjustmentType": "ChangeInCapacity",
+            "MetricAggregationType": "Average",
+            "Cooldown": 300,
+            "StepAdjustments": [{"MetricIntervalLowerBound": 0, "ScalingAdjustment": 1}],
+        },
+    )
+
+    cloudwatch_client.put_metric_alarm(
+        AlarmName=f"{endpoint_name}-has-backlog-without-capacity",
+        MetricName="HasBacklogWithoutCapacity",
+        Namespace="AWS/SageMaker",
+        Dimensions=[{"Name": "EndpointName", "Value": endpoint_name}],
+        Statistic="Average",
+        Period=60,
+        EvaluationPeriods=2,
+        DatapointsToAlarm=2,
+        Threshold=1,
+        ComparisonOperator="GreaterThanOrEqualToThreshold",
+        TreatMissingData="missing",
+        AlarmActions=[policy["PolicyARN"]],
+    )
+
+
+def night_min_capacity(schedule, min_capacity, mode):
+    """MinCapacity of the night schedule. Application Auto Scaling rejects 0
+    for real-time variants, only async endpoints may go down to zero."""
+    night_min = min(min_capacity, int(schedule.get("night_min_capacity", min_capacity)))
+    return night_min if mode == "async" else max(night_min, 1)
+
+
+def _configure_schedule(
+    client, endpoint_name, resource_id, settings, min_capacity, night_min
+):
+    """Cap capacity overnight and restore the normal range in the morning"""
+    schedule = settings["schedule"]
+    timezone = schedule.get("timezone", "UTC")
+    night_max = max(night_min, int(schedule.get("night_max_capacity", 1)))
+
+    actions = [
+        (
+            "scale-down",
+            schedule.get("scale_down_cron", "cron(0 22 * * ? *)"),
+            {"MinCapacity": night_min, "MaxCapacity": night_max},
+        ),
+        (
+            "scale-up",
+            schedule.get("scale_up_cron", "cron(0 6 * * ? *)"),
+            {"MinCapacity": min_capacity, "MaxCapacity": int(settings["max_capacity"])},
+        ),
+    ]
+    for name, cron, capacity in actions:
+        client.put_scheduled_action(
+            ServiceNamespace="sagemaker",
+            ScheduledActionName=f"{endpoint_name}-{name}",
+            ResourceId=resource_id,
+            ScalableDimension=SCALABLE_DIMENSION,
+            Schedule=cron,
+            Timezone=timezone,
+            ScalableTargetAction=capacity,
+        )
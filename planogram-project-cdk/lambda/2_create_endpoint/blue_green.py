@@ -0,0 +1,130 @@
+# In-place update of a stable endpoint name, so the invoke Lambda's
+# ML_ENDPOINT never changes. SageMaker provisions the new (green) fleet from
+# the new endpoint config, waits for /ping to pass, which inference.py only
+# does after model_fn has warmed the model up, then shifts traffic and
+# keeps the old (blue) fleet until the termination wait has passed.
+# {
+#   "train_folder": "yolo11x-20250807-103858",
+#   "instance_type": "ml.c5.xlarge",
+#   "update": true,
+#   "endpoint_name": "yolo11x-endpoint",
+#   "traffic_routing": "canary",
+#   "canary_percent": 10,
+#   "wait_seconds": 300,
+#   "termination_wait_seconds": 300,
+#   "rollback_alarms": ["yolo11x-endpoint-5xx"]
+# }
+
+VARIANT_NAME = "AllTraffic"
+
+
+def endpoint_exists(sagemaker_client, endpoint_name):
+    try:
+        sagemaker_client.describe_endpoint(EndpointName=endpoint_name)
+    except sagemaker_client.exceptions.ClientError as e:
+        if "Could not find endpoint" in str(e):
+            return False
+        raise
+    return True
+
+
+def current_instance_count(sagemaker_client, endpoint_name, default=1):
+    """Instances the live variant runs now, so autoscaled capacity survives the swap"""
+    if not endpoint_exists(sagemaker_client, endpoint_name):
+        return default
+    endpoint = sagemaker_client.describe_endpoint(EndpointName=endpoint_name)
+    for variant in endpoint.get("ProductionVariants", []):
+        if variant["VariantName"] == VARIANT_NAME:
+            return variant.get("DesiredInstanceCount") or variant.get(
+                "CurrentInstanceCount", default
+            )
+    return default
+
+
+def build_endpoint_config(
+    endpoint_config_name,
+    model_name,
+    instance_type,
+    instance_count,
+    async_inference_config=None,
+):
+    """CreateEndpointConfig request for a single-variant endpoint"""
+    config = {
+        "EndpointConfigName": endpoint_config_name,
+        "ProductionVariants": [
+            {
+                "VariantName": VARIANT_NAME,
+                "ModelName": model_name,
+                "InstanceType": instance_type,
+                "InitialInstanceCount": int(instance_count),
+            }
+        ],
+        "Tags": [{"Key": "project", "Value": "planogram"}],
+    }
+    if async_inference_config:
+        config["AsyncInferenceConfig"] = async_inference_config
+    return config
+
+
+def build_deployment_config(event):
+    """Blue/green DeploymentConfig for UpdateEndpoint from the event"""
+    routing_type = event.get("traffic_routing", "all_at_once").upper()
+    routing = {
+        "Type": routing_type,
+        "WaitIntervalInSeconds": int(event.get("wait_seconds", 300)),
+    }
+    if routing_type == "CANARY":
+        routing["CanarySize"] = {
+            "Type": "CAPACITY_PERCENT",
+            "Value": int(event.get("canary_percent", 10)),
+        }
+    elif routing_type == "LINEAR":
+        routing["LinearStepSize"] = {
+            "Type": "CAPACITY_PERCENT",
+            "Value": int(event.get("linear_step_percent", 25)),
+        }
+    elif routing_type != "ALL_AT_ONCE":
+        raise ValueError(f"Unsupported traffic_routing: {event.get('traffic_routing')}")
+
+    config = {
+        "BlueGreenUpdatePolicy": {
+            "TrafficRoutingConfiguration": routing,
+            "TerminationWaitInSeconds": int(event.get("termination_wait_seconds", 300)),
+            "MaximumExecutionTimeoutInSeconds": int(
+                event.get("max_execution_seconds", 3600)
+            ),
+        }
+    }
+    if event.get("rollback_alarms"):
+        config["AutoRollbackConfiguration"] = {
+            "Alarms": [{"AlarmName": name} for name in event["rollback_alarms"]]
+        }
+    return config
+
+
+def deploy_blue_green(sagemaker_client, endpoint_name, endpoint_config, event):
+    """Create the endpoint config and point ``endpoint_name`` at it.
+
+    The first deployment creates the endpoint, later ones update it in place
+    with a blue/green swap. Returns without waiting, the old fleet keeps
+    serving until the new one is healthy.
+    """
+    sagemaker_client.create_endpoint_config(**endpoint_config)
+    endpoint_config_name = endpoint_config["EndpointConfigName"]
+
+    if not endpoint_exists(sagemaker_client, endpoint_name):
+        sagemaker_client.create_endpoint(
+            EndpointName=endpoint_name,
+            EndpointConfigName=endpoint_config_name,
+            Tags=[{"Key": "project", "Value": "planogram"}],
+        )
+        print(f"Creating endpoint {endpoint_name} with {endpoint_config_name}")
+        return "Creating"
+
+    sagemaker_client.update_endpoint(
+        EndpointName=endpoint_name,
+        EndpointConfigName=endpoint_config_name,
+        DeploymentConfig=build_deployment_config(event),
+    )
+    print(f"Blue/green update of {endpoint_name} to {endpoint_config_name} started")
+    return "Updating"
@@ -0,0 +1,46 @@
+# Account hosting the AWS Deep Learning Containers in each region the PyTorch
+# image is resolved for, by lambda_function.py and by
+# build_ecr_image/upload_image_to_ECR.py for the serving image's base. Anywhere
+# else, pass "inference_image" in the event or set INFERENCE_IMAGE_URI
+# (config "endpoint.inference_image").
+DLC_ACCOUNT = "763104351884"
+DLC_REGION_ACCOUNTS = {
+    **{
+        region: DLC_ACCOUNT
+        for region in (
+            "us-east-1",
+            "us-east-2",
+            "us-west-1",
+            "us-west-2",
+            "ca-central-1",
+            "sa-east-1",
+            "eu-west-1",
+            "eu-west-2",
+            "eu-west-3",
+            "eu-central-1",
+            "eu-north-1",
+            "ap-northeast-1",
+            "ap-northeast-2",
+            "ap-northeast-3",
+            "ap-southeast-1",
+            "ap-southeast-2",
+            "ap-south-1",
+        )
+    },
+    "af-south-1": "626614931356",
+    "ap-east-1": "871362719292",
+    "ap-southeast-3": "907027046896",
+    "eu-south-1": "692866216735",
+    "il-central-1": "780543022126",
+    "me-south-1": "217643126080",
+    "cn-north-1": "727897471807",
+    "cn-northwest-1": "727897471807",
+}
+
+
+def dlc_registry(region):
+    """ECR registry of the Deep Learning Containers in ``region``"""
+    if region not in DLC_REGION_ACCOUNTS:
+        raise ValueError(f"No AWS Deep Learning Containers account known for {region}")
+    domain = "amazonaws.com.cn" if region.startswith("cn-") else "amazonaws.com"
+    return f"{DLC_REGION_ACCOUNTS[region]}.dkr.ecr.{region}.{domain}"
@@ -1,66 +1,315 @@
 import boto3
-import sagemaker
 import os
+import time
 import json
-from sagemaker.model import Model
-from sagemaker.predictor import Predictor
 from datetime import datetime
+from autoscaling import autoscaling_settings, configure_autoscaling
+from dlc_images import DLC_REGION_ACCOUNTS, dlc_registry
+from blue_green import (
+    build_endpoint_config,
+    current_instance_count,
+    deploy_blue_green,
+    endpoint_exists,
+)
+from shadow import build_shadow_endpoint_config, live_production_variant
 
 # {
 #   "train_folder": "yolo11x-20250807-103858",
 #   "instance_type": "ml.c5.xlarge"
 # }
+#
+# "serving_image" (or SERVING_IMAGE_URI) deploys the slim artifact from
+# build_ecr_image/package_model.py on the serving.dockerfile image, whose
+# dependencies are preinstalled, instead of model.tar.gz on the stock
+# PyTorch image that pip installs code/requirements.txt at start-up.
+# {
+#   "train_folder": "yolo11x-20250807-103858",
+#   "serving_image": "<account>.dkr.ecr.<region>.amazonaws.com/yolo11-serving:latest"
+# }
+#
+# With a serving image, "micro_batch_max_size" > 1 turns on TorchServe
+# batching: concurrent requests are held for up to "micro_batch_max_wait_ms"
+# (default 10) and run through one forward pass by inference.py's handle().
+# "micro_batch_workers" (default 1) sets the model workers per instance.
+# {
+#   "train_folder": "yolo11x-20250807-103858",
+#   "serving_image": "<account>.dkr.ecr.<region>.amazonaws.com/yolo11-serving:latest",
+#   "micro_batch_max_size": 8,
+#   "micro_batch_max_wait_ms": 10
+# }
+#
+# Asynchronous endpoint for bulk/backfill traffic: requests are queued, read
+# from S3 and answered into "async_output_s3" (default ASYNC_OUTPUT_S3).
+# Without SNS topics callers poll S3 for the output or failure object.
+# {
+#   "train_folder": "yolo11x-20250807-103858",
+#   "instance_type": "ml.c5.xlarge",
+#   "mode": "async",
+#   "async_output_s3": "s3://bucket/async-inference",
+#   "max_concurrent_invocations_per_instance": 4,
+#   "success_topic_arn": "arn:aws:sns:...",
+#   "error_topic_arn": "arn:aws:sns:..."
+# }
+#
+# Either mode accepts an "autoscaling" block, see autoscaling.py. Async
+# endpoints may use "min_capacity": 0 to scale to zero when idle.
+#
+# Deployments target the stable endpoint name (ENDPOINT_NAME, or
+# ASYNC_ENDPOINT_NAME with "mode": "async", the ones the invoke Lambda calls)
+# unless the event names another "endpoint_name". The first deployment creates
+# it, later ones update it with a blue/green swap, see blue_green.py.
+# "update": true only allows the swap: it fails instead of creating an endpoint
+# that doesn't exist yet, e.g. under a mistyped name. "shadow": true instead
+# mirrors part of the stable endpoint's traffic to the new model, see shadow.py.
+#
+# Deployments return as soon as SageMaker accepted them. Check on one, and
+# attach autoscaling once it is InService, with:
+# {
+#   "endpoint_status": "yolo11x-endpoint",
+#   "autoscaling": {"min_capacity": 1, "max_capacity": 4}
+# }
+
+sagemaker_client = boto3.client("sagemaker")
+
+PYTORCH_VERSION = "2.0.0"
+PYTHON_VERSION = "py310"
+GPU_INSTANCE_FAMILIES = ("ml.p", "ml.g")
+
+
+def pytorch_inference_image_uri(event, region, instance_type):
+    """PyTorch inference DLC image for the instance type, same image the
+    SageMaker SDK's image_uris.retrieve returns"""
+    image = event.get("inference_image", os.getenv("INFERENCE_IMAGE_URI"))
+    if image:
+        return image
+    if region not in DLC_REGION_ACCOUNTS:
+        raise ValueError(
+            f"No PyTorch inference image known for region {region}, set "
+            '"inference_image" in the event or INFERENCE_IMAGE_URI'
+        )
+
+    processor = "gpu" if instance_type.startswith(GPU_INSTANCE_FAMILIES) else "cpu"
+    return (
+        f"{dlc_registry(region)}/pytorch-inference:"
+        f"{PYTORCH_VERSION}-{processor}-{PYTHON_VERSION}"
+    )
+
+
+def wait_for_endpoint(endpoint_name, context, poll_seconds=15, reserve_seconds=60):
+    """Poll until the endpoint leaves Creating/Updating or the Lambda is about
+    to time out, and return its last status instead of raising"""
+    while True:
+        status = sagemaker_client.describe_endpoint(EndpointName=endpoint_name)[
+            "EndpointStatus"
+        ]
+        if status not in ("Creating", "Updating", "SystemUpdating"):
+            return status
+        if context.get_remaining_time_in_millis() < (poll_seconds + reserve_seconds) * 1000:
+            return status
+        time.sleep(poll_seconds)
+
+
+def apply_autoscaling(endpoint_name, settings, mode):
+    return configure_autoscaling(
+        endpoint_name,
+        settings,
+        boto3.client("application-autoscaling"),
+        boto3.client("cloudwatch"),
+        mode,
+    )
+
+
+def endpoint_status_handler(event, context):
+    endpoint_name = event["endpoint_status"]
+    endpoint = sagemaker_client.describe_endpoint(EndpointName=endpoint_name)
+    body = {
+        "endpoint_name": endpoint_name,
+        "status": endpoint["EndpointStatus"],
+        "failure_reason": endpoint.get("FailureReason"),
+    }
+
+    settings = autoscaling_settings(event)
+    if settings and endpoint["EndpointStatus"] == "InService":
+        mode = "async" if endpoint.get("AsyncInferenceConfig") else "realtime"
+        body["autoscaling"] = apply_autoscaling(endpoint_name, settings, mode)
+
+    return {"statusCode": 200, "body": body}
+
+
+def batching_environment(event):
+    """TorchServe batching variables for the serving image's entrypoint"""
+    max_size = int(event.get("micro_batch_max_size", 1))
+    if max_size <= 1:
+        return {}
+    workers = str(int(event.get("micro_batch_workers", 1)))
+    return {
+        "SAGEMAKER_TS_BATCH_SIZE": str(max_size),
+        "SAGEMAKER_TS_MAX_BATCH_DELAY": str(int(event.get("micro_batch_max_wait_ms", 10))),
+        # Setting the batch variables makes the toolkit write the model's
+        # worker counts too, they default to 1 there
+        "SAGEMAKER_TS_MIN_WORKERS": workers,
+        "SAGEMAKER_TS_MAX_WORKERS": workers,
+    }
+
+
+def model_container(event, region, instance_type):
+    """PrimaryContainer of CreateModel, for the slim serving artifact when a
+    serving image is configured, otherwise for the training job's model.tar.gz"""
+    output_uri = f'{os.getenv("S3_MODEL_BUCKET")}/{event.get("train_folder")}/output'
+    serving_image = event.get("serving_image", os.getenv("SERVING_IMAGE_URI"))
+    environment = {
+        "SAGEMAKER_PROGRAM": "inference.py",
+        "SAGEMAKER_REGION": region,
+        "TS_MAX_RESPONSE_SIZE": "20000000",
+        "YOLO11_MODEL": "model.pt",
+    }
+
+    batching = batching_environment(event)
+
+    if not serving_image:
+        if batching:
+            raise ValueError("micro_batch_max_size needs a serving_image")
+        model_data = f"{output_uri}/model.tar.gz"
+        environment["SAGEMAKER_SUBMIT_DIRECTORY"] = model_data
+        container = {
+            "Image": pytorch_inference_image_uri(event, region, instance_type),
+            "ModelDataUrl": model_data,
+        }
+        return container, model_data, environment
+
+    # Uncompressed, copied file by file into /opt/ml/model with no extraction
+    model_data = f"{output_uri}/serving/"
+    environment["SAGEMAKER_SUBMIT_DIRECTORY"] = "/opt/ml/model/code"
+    environment.update(batching)
+    container = {
+        "Image": serving_image,
+        "ModelDataSource": {
+            "S3DataSource": {
+                "S3Uri": model_data,
+                "S3DataType": "S3Prefix",
+                "CompressionType": "None",
+            }
+        },
+    }
+    return container, model_data, environment
+
+
+def build_async_inference_config(event, endpoint_name):
+    """AsyncInferenceConfig of CreateEndpointConfig"""
+    output_path = event.get("async_output_s3", os.getenv("ASYNC_OUTPUT_S3")).rstrip("/")
+
+    output_config = {
+        "S3OutputPath": f"{output_path}/{endpoint_name}/output",
+        "S3FailurePath": f"{output_path}/{endpoint_name}/failure",
+    }
+    notification_config = {}
+    if event.get("success_topic_arn"):
+        notification_config["SuccessTopic"] = event["success_topic_arn"]
+    if event.get("error_topic_arn"):
+        notification_config["ErrorTopic"] = event["error_topic_arn"]
+    if notification_config:
+        output_config["NotificationConfig"] = notification_config
+
+    return {
+        "OutputConfig": output_config,
+        "ClientConfig": {
+            "MaxConcurrentInvocationsPerInstance": int(
+                event.get("max_concurrent_invocations_per_instance", 4)
+            )
+        },
+    }
+
+
+def event_flag(event, key):
+    """Boolean event field, "false" from a console test event stays false"""
+    return str(event.get(key, "")).lower() in ("1", "true", "yes")
 
 
 def lambda_handler(event, context):
-    sagemaker_session = sagemaker.Session()
+    if "endpoint_status" in event:
+        return endpoint_status_handler(event, context)
 
-    model_data = f'{os.getenv("S3_MODEL_BUCKET")}/{event.get("train_folder")}/output/model.tar.gz'
     model_name = f'yolo11x-model-{datetime.now().strftime("%Y%m%d-%H%M%S")}'
-    endpoint_name = f'yolo11x-endpoint-{datetime.now().strftime("%Y%m%d-%H%M%S")}'
+    mode = event.get("mode", "realtime")
+    if mode not in ("realtime", "async"):
+        raise ValueError(f"Unsupported mode: {mode}")
+    shadow = event_flag(event, "shadow")
+    if shadow and mode == "async":
+        raise ValueError("Shadow variants are only supported on real-time endpoints")
+    stable_name = os.getenv("ASYNC_ENDPOINT_NAME" if mode == "async" else "ENDPOINT_NAME")
+    endpoint_name = event.get("endpoint_name", stable_name)
+    exists = endpoint_exists(sagemaker_client, endpoint_name)
+    if (event_flag(event, "update") or shadow) and not exists:
+        raise ValueError(f"Endpoint {endpoint_name} doesn't exist, nothing to update")
     region = boto3.Session().region_name
-    pytorch_inference_image = sagemaker.image_uris.retrieve(
-        framework="pytorch",
-        region=region,
-        version="2.0.0",
-        py_version="py310",
-        image_scope="inference",
-        instance_type=event.get("instance_type", "ml.m5.xlarge"),
-    )
+    instance_type = event.get("instance_type", "ml.m5.xlarge")
 
-    model = Model(
-        model_data=model_data,
-        image_uri=pytorch_inference_image,
-        role=os.getenv("ENDPOINT_ROLE"),
-        name=model_name,
-        sagemaker_session=sagemaker_session,
-        env={
-            "SAGEMAKER_PROGRAM": "inference.py",
-            "SAGEMAKER_SUBMIT_DIRECTORY": model_data,
-            "SAGEMAKER_REGION": region,
-            "TS_MAX_RESPONSE_SIZE": "20000000",
-            "YOLO11_MODEL": "model.pt",
-        },
+    container, model_data, environment = model_container(event, region, instance_type)
+    sagemaker_client.create_model(
+        ModelName=model_name,
+        ExecutionRoleArn=os.getenv("ENDPOINT_ROLE"),
+        PrimaryContainer={**container, "Environment": environment},
+        Tags=[{"Key": "project", "Value": "planogram"}],
     )
 
-    predictor = model.deploy(
-        initial_instance_count=1,
-        instance_type=event.get("instance_type", "ml.m5.xlarge"),
-        endpoint_name=endpoint_name,
-        tags=[
-            {"Key": "project", "Value": "planogram"},
-        ],
+    async_config = (
+        build_async_inference_config(event, endpoint_name) if mode == "async" else None
     )
 
-    print(f"Model deployed successfully!")
-    print(f"Model name: {model_name}")
-    print(f"Endpoint name: {endpoint_name}")
+    if shadow:
+        endpoint_config = build_shadow_endpoint_config(
+            f"{model_name}-shadow-config",
+            live_production_variant(sagemaker_client, endpoint_name),
+            model_name,
+            instance_type,
+            event.get("shadow_percent", 20),
+            os.getenv("CAPTURE_S3"),
+        )
+    else:
+        endpoint_config = build_endpoint_config(
+            f"{model_name}-config",
+            model_name,
+            instance_type,
+            current_instance_count(sagemaker_client, endpoint_name) if exists else 1,
+            async_config,
+        )
+
+    # Returns once SageMaker accepted the request, a new endpoint takes minutes
+    status = deploy_blue_green(sagemaker_client, endpoint_name, endpoint_config, event)
+
+    print(f"Model created: {model_name}")
+    print(f"Endpoint name: {endpoint_name} ({mode}, {status})")
+
+    body = {
+        "model_data": model_data,
+        "model_name": model_name,
+        "endpoint_name": endpoint_name,
+        "mode": mode,
+        "status": status,
+    }
+    if shadow:
+        body["shadow_percent"] = event.get("shadow_percent", 20)
+        body["capture_s3"] = os.getenv("CAPTURE_S3")
+    if async_config is not None:
+        body["async_output_path"] = async_config["OutputConfig"]["S3OutputPath"]
+        body["async_failure_path"] = async_config["OutputConfig"]["S3FailurePath"]
+
+    settings = autoscaling_settings(event)
+    if settings and status == "Creating":
+        # Registering a scalable target needs the endpoint InService, wait while
+        # the Lambda has time left
+        status = body["status"] = wait_for_endpoint(endpoint_name, context)
+    if settings and status == "InService":
+        body["autoscaling"] = apply_autoscaling(endpoint_name, settings, mode)
+    elif settings and status == "Updating":
+        # The scalable target of the stable variant outlives the swap
+        print("Endpoint is updating, keeping its existing autoscaling settings")
+    elif settings:
+        body["autoscaling"] = (
+            f"pending, invoke again with endpoint_status={endpoint_name} once InService"
+        )
 
     return {
         "statusCode": 200,
-        "body": {
-            "model_data": model_data,
-            "model_name": model_name,
-            "endpoint_name": endpoint_name,
-        },
+        "body": body,
     }
@@ -0,0 +1,78 @@
+# Shadow test of a candidate model on the stable endpoint: the live model
+# keeps answering every request while SageMaker mirrors "shadow_percent" of
+# them to the candidate and drops its responses. Data capture stores both
+# variants' responses so 3_invoke_yolo/compare_shadow.py can compare them.
+# {
+#   "train_folder": "yolo11x-20250901-081500",
+#   "instance_type": "ml.c5.xlarge",
+#   "shadow": true,
+#   "shadow_percent": 20
+# }
+#
+# Promote the candidate afterwards with a normal "update": true run of the
+# same train_folder, which also removes the shadow variant.
+
+from blue_green import VARIANT_NAME, current_instance_count
+
+SHADOW_VARIANT_NAME = "Shadow"
+
+
+def live_production_variant(sagemaker_client, endpoint_name):
+    """The production variant of the endpoint config the endpoint runs now"""
+    endpoint = sagemaker_client.describe_endpoint(EndpointName=endpoint_name)
+    config = sagemaker_client.describe_endpoint_config(
+        EndpointConfigName=endpoint["EndpointConfigName"]
+    )
+    for variant in config["ProductionVariants"]:
+        if variant["VariantName"] == VARIANT_NAME:
+            variant = dict(variant)
+            variant["InitialInstanceCount"] = current_instance_count(
+                sagemaker_client, endpoint_name, variant["InitialInstanceCount"]
+            )
+            return variant
+    raise ValueError(f"Endpoint {endpoint_name} has no {VARIANT_NAME} variant")
+
+
+def build_shadow_endpoint_config(
+    endpoint_config_name,
+    production_variant,
+    candidate_model_name,
+    instance_type,
+    shadow_percent,
+    capture_s3,
+):
+    """CreateEndpointConfig request keeping the live model in production and
+    mirroring ``shadow_percent`` of requests to the candidate"""
+    if not 0 < float(shadow_percent) <= 100:
+        raise ValueError("shadow_percent must be in (0, 100]")
+
+    production = {
+        "VariantName": VARIANT_NAME,
+        "ModelName": production_variant["ModelName"],
+        "InstanceType": production_variant["InstanceType"],
+        "InitialInstanceCount": int(production_variant["InitialInstanceCount"]),
+        "InitialVariantWeight": 1.0,
+    }
+    return {
+        "EndpointConfigName": endpoint_config_name,
+        "ProductionVariants": [production],
+        # The sampled fraction is the shadow weight relative to production's
+        "ShadowProductionVariants": [
+            {
+                "VariantName": SHADOW_VARIANT_NAME,
+                "ModelName": candidate_model_name,
+                "InstanceType": instance_type,
+                "InitialInstanceCount": 1,
+                "InitialVariantWeight": float(shadow_percent) / 100,
+            }
+        ],
+        # Outputs only, the detections are small and the images already in S3
+        "DataCaptureConfig": {
+            "EnableCapture": True,
+            "InitialSamplingPercentage": 100,
+            "DestinationS3Uri": capture_s3,
+            "CaptureOptions": [{"CaptureMode": "Output"}],
+            "CaptureContentTypeHeader": {"JsonContentTypes": ["application/json"]},
+        },
+        "Tags": [{"Key": "project", "Value": "planogram"}],
+    }
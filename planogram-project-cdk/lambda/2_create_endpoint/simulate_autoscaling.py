@@ -0,0 +1,241 @@
+"""Replay an hourly upload histogram against the endpoint's autoscaling policy.
+
+Estimates how many instances the target tracking policy would run each hour
+and how long requests would queue for a free instance, without deploying:
+
+    python simulate_autoscaling.py --histogram uploads.json --service-seconds 0.8
+
+``uploads.json`` holds 24 hourly upload counts (a list, or {"0": n, ...}).
+The policy settings default to autoscaling.DEFAULT_AUTOSCALING and can be read
+from the same event JSON passed to 2_create_endpoint with --event.
+"""
+
+import json
+import math
+import heapq
+import random
+import argparse
+from collections import deque
+
+from autoscaling import DEFAULT_AUTOSCALING
+
+# Uploads per hour after store visits, used when no histogram is given
+SAMPLE_HISTOGRAM = [
+    2, 0, 0, 0, 0, 5, 40, 120, 260, 380, 420, 300,
+    180, 220, 360, 400, 310, 190, 90, 40, 20, 10, 5, 3,
+]
+
+# CloudWatch alarms behind target tracking: scale out after 3 one-minute
+# datapoints above target, scale in after 15 below 90% of it
+SCALE_OUT_DATAPOINTS = 3
+SCALE_IN_DATAPOINTS = 15
+SCALE_IN_THRESHOLD = 0.9
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--histogram", type=str, default=None)
+    parser.add_argument("--event", type=str, default=None, help="2_create_endpoint event JSON")
+    parser.add_argument(
+        "--service-seconds",
+        type=float,
+        required=True,
+        help="Endpoint time per request on one instance, e.g. load_test.py p50",
+    )
+    parser.add_argument("--workers-per-instance", type=int, default=1)
+    parser.add_argument(
+        "--provision-minutes",
+        type=float,
+        default=6.0,
+        help="Time from scale-out decision until a new instance serves traffic",
+    )
+    parser.add_argument("--price-per-hour", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def load_histogram(path):
+    if path is None:
+        return list(SAMPLE_HISTOGRAM)
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = [data.get(str(hour), 0) for hour in range(24)]
+    if len(data) != 24:
+        raise ValueError("The histogram needs 24 hourly counts")
+    return [int(count) for count in data]
+
+
+def load_settings(path):
+    settings = dict(DEFAULT_AUTOSCALING)
+    if path:
+        with open(path) as f:
+            settings.update(json.load(f).get("autoscaling", {}))
+    settings["min_capacity"] = max(int(settings["min_capacity"]), 1)
+    return settings
+
+
+def capacity_bounds(settings, hour):
+    """Min/max capacity in effect at ``hour`` given the scheduled actions"""
+    low, high = settings["min_capacity"], int(settings["max_capacity"])
+    schedule = settings.get("schedule")
+    if not schedule:
+        return low, high
+
+    # Only the hour field of "cron(M H * * ? *)" matters at this resolution
+    down = int(schedule.get("scale_down_cron", "cron(0 22 * * ? *)").split()[1])
+    up = int(schedule.get("scale_up_cron", "cron(0 6 * * ? *)").split()[1])
+    night = hour >= down or hour < up if down > up else down <= hour < up
+    if night:
+        night_min = min(low, int(schedule.get("night_min_capacity", low)))
+        return max(night_min, 1), max(night_min, int(schedule.get("night_max_capacity", 1)))
+    return low, high
+
+
+def generate_arrivals(histogram, rng):
+    """Poisson arrivals (seconds since midnight) at each hour's rate"""
+    arrivals = []
+    for hour, count in enumerate(histogram):
+        if not count:
+            continue
+        t = hour * 3600.0
+        while True:
+            t += rng.expovariate(count / 3600.0)
+            if t >= (hour + 1) * 3600:
+                break
+            arrivals.append(t)
+    return arrivals
+
+
+def simulate_capacity(arrivals, settings, provision_minutes):
+    """Instances in service for each minute of the day under target tracking.
+
+    InvocationsPerInstance counts requests received, not served, so the policy
+    only depends on the arrivals and can be simulated before the queue.
+    """
+    per_minute = [0] * 1440
+    for t in arrivals:
+        per_minute[int(t // 60)] += 1
+
+    target = float(settings["target_invocations_per_instance"])
+    scale_out_cooldown = int(settings["scale_out_cooldown"]) / 60
+    scale_in_cooldown = int(settings["scale_in_cooldown"]) / 60
+
+    in_service = settings["min_capacity"]
+    desired = in_service
+    pending = []  # (minute the instances come in service, count)
+    above = below = 0
+    last_out = last_in = -math.inf
+    timeline = []
+
+    for minute in range(1440):
+        while pending and pending[0][0] <= minute:
+            in_service += heapq.heappop(pending)[1]
+
+        low, high = capacity_bounds(settings, minute // 60)
+        if desired < low or desired > high:
+            # Scheduled actions clamp the capacity directly
+            desired = min(max(desired, low), high)
+            if desired < in_service:
+                in_service = desired
+            elif desired > in_service + sum(n for _, n in pending):
+                heapq.heappush(
+                    pending,
+                    (minute + provision_minutes, desired - in_service - sum(n for _, n in pending)),
+                )
+
+        metric = per_minute[minute] / max(in_service, 1)
+        above = above + 1 if metric > target else 0
+        below = below + 1 if metric < target * SCALE_IN_THRESHOLD else 0
+        wanted = min(max(math.ceil(per_minute[minute] / target), low), high)
+
+        if above >= SCALE_OUT_DATAPOINTS and wanted > desired and minute - last_out >= scale_out_cooldown:
+            heapq.heappush(pending, (minute + provision_minutes, wanted - desired))
+            desired, last_out, above = wanted, minute, 0
+        elif (
+            below >= SCALE_IN_DATAPOINTS
+            and wanted < desired
+            and not pending
+            and minute - max(last_in, last_out) >= scale_in_cooldown
+        ):
+            desired = in_service = wanted
+            last_in, below = minute, 0
+
+        timeline.append(in_service)
+    return timeline
+
+
+def simulate_queue(arrivals, timeline, service_seconds, workers_per_instance):
+    """FIFO queue in front of the instances' workers, returns each request's wait"""
+    waiting = deque(arrivals)
+    workers = []  # times at which each worker is next free
+    waits = []
+
+    for second in range(86400):
+        wanted = timeline[second // 60] * workers_per_instance
+        if len(workers) < wanted:
+            workers += [float(second)] * (wanted - len(workers))
+        elif len(workers) > wanted:
+            # Removed instances finish their current request first
+            workers = sorted(workers)[: wanted]
+
+        for i in range(len(workers)):
+            while waiting and waiting[0] < second + 1:
+                start = max(workers[i], waiting[0], second)
+                if start >= second + 1:
+                    break
+                waits.append((waiting[0], start - waiting.popleft()))
+                workers[i] = start + service_seconds
+
+    # Whatever is still queued at midnight waits until the next free worker
+    free = min(workers) if workers else 86400.0
+    for arrival in waiting:
+        waits.append((arrival, max(free, arrival) - arrival))
+        free = max(free, arrival) + service_seconds / max(len(workers), 1)
+    return waits
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def main():
+    args = parse_args()
+    histogram = load_histogram(args.histogram)
+    settings = load_settings(args.event)
+    rng = random.Random(args.seed)
+
+    arrivals = generate_arrivals(histogram, rng)
+    timeline = simulate_capacity(arrivals, settings, args.provision_minutes)
+    waits = simulate_queue(arrivals, timeline, args.service_seconds, args.workers_per_instance)
+
+    print(
+        f"Policy: {settings['min_capacity']}-{settings['max_capacity']} instances, "
+        f"target {settings['target_invocations_per_instance']} invocations/instance/min, "
+        f"{args.service_seconds}s per request"
+    )
+    print(f"{'hour':>4} {'uploads':>8} {'instances':>10} {'p50 wait':>9} {'p95 wait':>9} {'max wait':>9}")
+    for hour in range(24):
+        hour_waits = [w for a, w in waits if int(a // 3600) == hour]
+        instances = sum(timeline[hour * 60 : (hour + 1) * 60]) / 60
+        print(
+            f"{hour:>4} {histogram[hour]:>8} {instances:>10.1f} "
+            f"{percentile(hour_waits, 50):>8.1f}s {percentile(hour_waits, 95):>8.1f}s "
+            f"{max(hour_waits, default=0.0):>8.1f}s"
+        )
+
+    all_waits = [w for _, w in waits]
+    instance_hours = sum(timeline) / 60
+    print("=" * 50)
+    print(f"Requests: {len(all_waits)}")
+    print(f"Queueing delay p50/p95/p99: {percentile(all_waits, 50):.1f}s / {percentile(all_waits, 95):.1f}s / {percentile(all_waits, 99):.1f}s")
+    print(f"Instance-hours: {instance_hours:.1f} (peak {max(timeline)} instances)")
+    if args.price_per_hour:
+        print(f"Estimated cost: ${instance_hours * args.price_per_hour:.2f}/day")
+
+
+if __name__ == "__main__":
+    main()
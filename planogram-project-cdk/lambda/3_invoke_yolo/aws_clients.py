@@ -0,0 +1,63 @@
+import os, threading
+import boto3
+from botocore.config import Config
+
+# Clients and resources are created on first use and kept at module level, so
+# warm invocations reuse them along with their pooled, already-open HTTPS
+# connections instead of paying for client setup and a TLS handshake again.
+#
+# Clients use the Lambda's own region (AWS_DEFAULT_REGION), where the
+# endpoint, the buckets and the table are deployed. Only Bedrock is called in
+# DEFAULT_REGION, where the inference profile lives.
+BEDROCK_REGION = os.getenv("DEFAULT_REGION")
+
+BASE_CONFIG = Config(
+    max_pool_connections=int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "10")),
+    tcp_keepalive=True,
+    connect_timeout=5,
+    retries={"max_attempts": 3, "mode": "standard"},
+)
+
+# Read timeouts per service, the default 60s is too short for Bedrock and
+# leaves no margin over the 60s real-time endpoint limit
+SERVICE_CONFIGS = {
+    "sagemaker-runtime": Config(read_timeout=70),
+    "bedrock-runtime": Config(
+        region_name=BEDROCK_REGION,
+        read_timeout=120,
+        retries={"max_attempts": 4, "mode": "adaptive"},
+    ),
+}
+
+_clients = {}
+_resources = {}
+# The decode pool in invoke_ml_model can ask for a client while the handler
+# thread does, only one of them should build it
+_lock = threading.Lock()
+
+
+def _config(service):
+    override = SERVICE_CONFIGS.get(service)
+    return BASE_CONFIG.merge(override) if override else BASE_CONFIG
+
+
+def get_client(service):
+    client = _clients.get(service)
+    if client is None:
+        with _lock:
+            client = _clients.get(service)
+            if client is None:
+                client = boto3.client(service, config=_config(service))
+                _clients[service] = client
+    return client
+
+
+def get_resource(service):
+    resource = _resources.get(service)
+    if resource is None:
+        with _lock:
+            resource = _resources.get(service)
+            if resource is None:
+                resource = boto3.resource(service, config=_config(service))
+                _resources[service] = resource
+    return resource
@@ -0,0 +1,214 @@
+"""Compare the production and shadow variants of the YOLO endpoint.
+
+Reads the responses data capture stored for both variants (see
+2_create_endpoint/shadow.py), pairs them by inference id and turns each into
+shelf counts with organize_bottles_by_shelf. Reports per-variant p50/p99
+ModelLatency from CloudWatch and how far the candidate's counts are from
+production's:
+
+    python compare_shadow.py --endpoint yolo11x-endpoint \\
+        --capture-s3 s3://<training-bucket>/data-capture --hours 24
+"""
+
+import io
+import json
+import base64
+import argparse
+import contextlib
+from datetime import datetime, timedelta, timezone
+
+import boto3
+import numpy
+
+from detect_product import DRINK_LABELS, extract_shelves_and_bottles, organize_bottles_by_shelf
+
+PRODUCTION_VARIANT = "AllTraffic"
+SHADOW_VARIANT = "Shadow"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--endpoint", type=str, required=True)
+    parser.add_argument("--capture-s3", type=str, required=True)
+    parser.add_argument("--hours", type=float, default=24.0)
+    parser.add_argument("--production-variant", type=str, default=PRODUCTION_VARIANT)
+    parser.add_argument("--shadow-variant", type=str, default=SHADOW_VARIANT)
+    parser.add_argument("--output", type=str, default=None, help="Write the report as JSON")
+    return parser.parse_args()
+
+
+def read_capture(s3, capture_s3, endpoint_name, variant, start, end):
+    """Captured responses of one variant as {inference id: record}"""
+    bucket, _, prefix = capture_s3.replace("s3://", "", 1).partition("/")
+    prefix = f"{prefix.rstrip('/')}/{endpoint_name}/{variant}/"
+
+    records = {}
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            if not start <= obj["LastModified"] <= end + timedelta(hours=1):
+                continue
+            body = s3.get_object(Bucket=bucket, Key=obj["Key"])["Body"].read()
+            for line in body.decode("utf-8").splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                metadata = record.get("eventMetadata", {})
+                key = metadata.get("inferenceId") or metadata.get("eventId")
+                records[key] = record
+    return records
+
+
+def decode_boxes(record):
+    """Detections of a captured x-npy or JSON response as a list of rows"""
+    output = record["captureData"]["endpointOutput"]
+    data = output["data"]
+    if output.get("encoding") == "BASE64":
+        data = base64.b64decode(data)
+    if output.get("observedContentType") == "application/x-npy":
+        return numpy.load(io.BytesIO(data)).tolist()
+    return json.loads(data).get("boxes", [])
+
+
+def shelf_counts(boxes):
+    # detect_product prints progress on every call, too noisy for a batch job
+    with contextlib.redirect_stdout(io.StringIO()):
+        shelves, bottles = extract_shelves_and_bottles(boxes)
+        return organize_bottles_by_shelf(shelves, bottles)["shelves"]
+
+
+def count_delta(production, candidate):
+    """Differences between two organize_bottles_by_shelf results"""
+    totals = {
+        label: sum(s["drinks"][label] for s in candidate)
+        - sum(s["drinks"][label] for s in production)
+        for label in DRINK_LABELS
+    }
+    # Shelves are numbered bottom-up, compare them position by position
+    per_shelf = 0
+    for i in range(max(len(production), len(candidate))):
+        p = production[i]["drinks"] if i < len(production) else {}
+        c = candidate[i]["drinks"] if i < len(candidate) else {}
+        per_shelf += sum(abs(c.get(label, 0) - p.get(label, 0)) for label in DRINK_LABELS)
+
+    return {
+        "shelves": len(candidate) - len(production),
+        "totals": totals,
+        "per_shelf_abs": per_shelf,
+    }
+
+
+def aligned_window(start, end):
+    """Widen [start, end) to whole periods of the finest resolution CloudWatch
+    still keeps at that age, so one period spans the whole window"""
+    age = datetime.now(timezone.utc) - start
+    step = 60 if age <= timedelta(days=15) else 300 if age <= timedelta(days=63) else 3600
+    start_ts = int(start.timestamp()) // step * step
+    end_ts = -(-int(end.timestamp()) // step) * step
+    return (
+        datetime.fromtimestamp(start_ts, timezone.utc),
+        datetime.fromtimestamp(end_ts, timezone.utc),
+    )
+
+
+def variant_latency(cloudwatch, endpoint_name, variant, start, end):
+    """p50/p99 ModelLatency (ms) of a variant over the whole window"""
+    start, end = aligned_window(start, end)
+    metric = {
+        "Namespace": "AWS/SageMaker",
+        "MetricName": "ModelLatency",
+        "Dimensions": [
+            {"Name": "EndpointName", "Value": endpoint_name},
+            {"Name": "VariantName", "Value": variant},
+        ],
+    }
+    period = int((end - start).total_seconds())
+    response = cloudwatch.get_metric_data(
+        MetricDataQueries=[
+            {
+                "Id": stat,
+                "MetricStat": {"Metric": metric, "Period": period, "Stat": stat},
+            }
+            for stat in ("p50", "p99")
+        ],
+        StartTime=start,
+        EndTime=end,
+    )
+    values = {r["Id"]: r["Values"] for r in response["MetricDataResults"]}
+    # ModelLatency is reported in microseconds
+    return {
+        f"{stat}_ms": round(values[stat][0] / 1000, 1) if values.get(stat) else None
+        for stat in ("p50", "p99")
+    }
+
+
+def compare(args, s3, cloudwatch):
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(hours=args.hours)
+
+    production = read_capture(
+        s3, args.capture_s3, args.endpoint, args.production_variant, start, end
+    )
+    shadow = read_capture(s3, args.capture_s3, args.endpoint, args.shadow_variant, start, end)
+    paired = [key for key in shadow if key in production]
+    print(
+        f"{len(production)} production and {len(shadow)} shadow responses, {len(paired)} paired"
+    )
+
+    deltas = []
+    for key in paired:
+        deltas.append(
+            count_delta(
+                shelf_counts(decode_boxes(production[key])),
+                shelf_counts(decode_boxes(shadow[key])),
+            )
+        )
+
+    n = len(deltas)
+    identical = sum(
+        1 for d in deltas if d["shelves"] == 0 and d["per_shelf_abs"] == 0
+    )
+    return {
+        "endpoint": args.endpoint,
+        "window_hours": args.hours,
+        "paired_requests": n,
+        "latency": {
+            args.production_variant: variant_latency(
+                cloudwatch, args.endpoint, args.production_variant, start, end
+            ),
+            args.shadow_variant: variant_latency(
+                cloudwatch, args.endpoint, args.shadow_variant, start, end
+            ),
+        },
+        "counts": {
+            "identical_fraction": round(identical / n, 3) if n else None,
+            "shelf_count_mismatch_fraction": (
+                round(sum(1 for d in deltas if d["shelves"]) / n, 3) if n else None
+            ),
+            "mean_per_shelf_abs_delta": (
+                round(sum(d["per_shelf_abs"] for d in deltas) / n, 3) if n else None
+            ),
+            # Candidate minus production, summed over all paired requests
+            "total_delta_by_drink": {
+                label: sum(d["totals"][label] for d in deltas) for label in DRINK_LABELS
+            },
+        },
+    }
+
+
+def main():
+    args = parse_args()
+    report = compare(args, boto3.client("s3"), boto3.client("cloudwatch"))
+
+    print("=" * 50)
+    print("Shadow comparison")
+    print("=" * 50)
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,16 +17,17 @@ def extract_shelves_and_bottles(detections):
     shelves = []
     bottles = []
     for item in detections:
-        if not isinstance(item, list) or len(item) < 6:
+        # Rows are lists (JSON responses) or float32 array rows (x-npy responses)
+        if len(item) < 6:
             continue
-        x1, y1, x2, y2, conf, class_id = item
+        x1, y1, x2, y2, conf, class_id = (float(v) for v in item[:6])
         cls_id = int(class_id)
-        label = CLASS_MAP.get(class_id)
+        label = CLASS_MAP.get(cls_id)
         bbox = [x1, y1, x2, y2]
 
         if label == SHELF_LABEL:
             shelves.append(bbox)
-        elif class_id in BOTTLE_CLASS_IDS:
+        elif cls_id in BOTTLE_CLASS_IDS:
             bottles.append({'type': label, 'bbox': bbox})
         else:
             continue  # ignore all other non-bottle objects
@@ -4,18 +4,23 @@ from datetime import datetime
 from decimal import Decimal
 from typing import Dict, Any, Optional, Union
 import uuid
+from aws_clients import get_resource
 
 
 class DynamoDBWriter:
-    def __init__(self, table_name: str, region_name: str = "ap-southeast-1"):
+    def __init__(self, table_name: str, region_name: Optional[str] = None):
         """
         Initialize DynamoDB writer
 
         Args:
             table_name: DynamoDB table name
-            region_name: AWS region (default us-east-1)
+            region_name: AWS region (default the Lambda's own region)
         """
-        self.dynamodb = boto3.resource("dynamodb", region_name=region_name)
+        if region_name is None:
+            # Shared resource, keeps its connections across warm invocations
+            self.dynamodb = get_resource("dynamodb")
+        else:
+            self.dynamodb = boto3.resource("dynamodb", region_name=region_name)
         self.table = self.dynamodb.Table(table_name)
         self.table_name = table_name
 
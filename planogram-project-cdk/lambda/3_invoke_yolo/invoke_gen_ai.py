@@ -1,52 +1,12 @@
-import boto3, json, os
+import json, os
+from aws_clients import get_client
+from prompt_templates import build_claude_body
 
 
 def invoke_claude(shelfResult):
-    client = boto3.client("bedrock-runtime", region_name=os.getenv("DEFAULT_REGION"))
+    client = get_client("bedrock-runtime")
     modelId = os.getenv("INFERENCE_PROFILE")
-    with open("1_system_prompt.txt", "r", encoding="utf-8") as f:
-        system_prompt = f.read()
-    with open("2_instructions.txt", "r", encoding="utf-8") as f:
-        instructions = f.read()
-    with open("3_last_message.txt", "r", encoding="utf-8") as f:
-        last_message = f.read()
-
-    instructions = instructions.replace(
-        "{shelf_data}", json.dumps(shelfResult, indent=2, ensure_ascii=False)
-    )
-
-    system = [
-        {
-            "type": "text",
-            "text": system_prompt,
-        }
-    ]
-
-    messages = [
-        {
-            "role": "user",
-            "content": [
-                {
-                    "type": "text",
-                    "text": instructions,
-                },
-                {
-                    "type": "text",
-                    "text": last_message,
-                },
-            ],
-        },
-    ]
-
-    body = {
-        "anthropic_version": "bedrock-2023-05-31",
-        "system": system,
-        "messages": messages,
-        "max_tokens": 500,
-        "top_p": 0.9,
-        "top_k": 20,
-        "temperature": 0,
-    }
+    body = build_claude_body(shelfResult)
 
     response = client.invoke_model(
         modelId=modelId,
@@ -56,6 +16,12 @@ def invoke_claude(shelfResult):
     )
     model_response = json.loads(response["body"].read())
     print(model_response)
+    usage = model_response["usage"]
+    if usage.get("cache_read_input_tokens") or usage.get("cache_creation_input_tokens"):
+        print(
+            f"Prompt cache: {usage.get('cache_read_input_tokens', 0)} tokens read, "
+            f"{usage.get('cache_creation_input_tokens', 0)} written"
+        )
     return [model_response["usage"], model_response["content"][0]["text"]]
 
 
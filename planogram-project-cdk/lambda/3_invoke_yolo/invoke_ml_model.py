@@ -1,41 +1,417 @@
-import boto3, cv2, time, base64, json, numpy, os
+import cv2, io, time, json, numpy, os, uuid
+from aws_clients import get_client
+from concurrent.futures import ThreadPoolExecutor
 
+# Resize and letterbox on the Lambda side so the endpoint receives an image
+# already at the model input size instead of the full-resolution photo. Off by
+# default, JPEG photos are then sent untouched. On, it wins over that
+# pass-through for JPEGs too: the smaller payload is the point of turning it on.
+CLIENT_RESIZE = os.getenv("YOLO_CLIENT_RESIZE", "false").lower() == "true"
+IMGSZ = int(os.getenv("YOLO_IMGSZ", "640"))
+JPEG_QUALITY = int(os.getenv("YOLO_JPEG_QUALITY", "95"))
+
+# Ask the endpoint for tiled inference, needs the full-resolution image so it
+# takes precedence over client-side resizing
+TILED = os.getenv("YOLO_TILED", "false").lower() == "true"
+
+# Send the endpoint the S3 URI of the photo instead of its bytes. The endpoint
+# then decodes the full-resolution original, so this takes precedence over
+# CLIENT_RESIZE and the JPEG pass-through of invoke_YOLO.
+S3_INPUT = os.getenv("YOLO_S3_INPUT", "false").lower() == "true"
+
+# Set (by "async_inference" in the stack config) to queue each photo on the
+# asynchronous endpoint instead and wait for its output. Requests then wait
+# out a scale-from-zero instead of failing. Takes precedence over S3_INPUT,
+# the async endpoint always reads the photo from S3.
+ASYNC_ENDPOINT = os.getenv("ML_ASYNC_ENDPOINT")
+ASYNC_POLL_SECONDS = 2
+# Time left for annotation, Bedrock and DynamoDB once the boxes are back
+ASYNC_RESERVE_MS = 60000
+
+# "endpoint" calls the SageMaker endpoint, "local" runs the int8 ONNX model in
+# this Lambda (see onnx_detector.py), for deployments too small to keep an
+# endpoint warm
+INFERENCE_MODE = os.getenv("YOLO_INFERENCE_MODE", "endpoint").lower()
+LOCAL_INFERENCE = INFERENCE_MODE == "local"
+
+CONF = 0.52
+IOU = 0.75
+
+JPEG_MAGIC = b"\xff\xd8\xff"
+
+# Photos of one S3 event sent in a single invoke_YOLO_batch call, under the
+# 6 MB real-time payload limit with room for the NPZ headers
+MAX_BATCH_BYTES = 5 * 1024 * 1024
+
+# Decodes the photo for annotation while the endpoint call is in flight,
+# cv2 releases the GIL so this overlaps with the network wait
+_decode_pool = ThreadPoolExecutor(max_workers=1)
+
+
+def decode_image(image_bytes):
+    return cv2.imdecode(numpy.frombuffer(image_bytes, numpy.uint8), cv2.IMREAD_COLOR)
+
+
+def encode_jpeg(image):
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])[
+        1
+    ].tobytes()
+
+
+def letterbox(image, imgsz=IMGSZ, color=(114, 114, 114)):
+    """Resize ``image`` to fit in imgsz x imgsz keeping its aspect ratio and pad
+    the rest, like ultralytics does. Returns the image, scale and (left, top) pad."""
+    height, width = image.shape[:2]
+    scale = min(imgsz / height, imgsz / width, 1.0)  # never upscale
+    new_width, new_height = round(width * scale), round(height * scale)
+    if (new_width, new_height) != (width, height):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_AREA)
+
+    pad_x, pad_y = (imgsz - new_width) / 2, (imgsz - new_height) / 2
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(
+        image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color
+    )
+    return image, scale, (left, top)
+
+
+def scale_boxes_back(boxes, scale, pad, original_shape):
+    """Map x1, y1, x2, y2 of letterboxed detections back to the original image"""
+    boxes = numpy.array(boxes, dtype=numpy.float32)
+    if len(boxes):
+        height, width = original_shape[:2]
+        boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad[0]) / scale).clip(0, width)
+        boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad[1]) / scale).clip(0, height)
+    return boxes
+
+
+def decode_npy(body):
+    """Decode an application/x-npy response as a read-only view over ``body``,
+    without copying the array data"""
+    stream = io.BytesIO(body)
+    version = numpy.lib.format.read_magic(stream)
+    if version == (1, 0):
+        shape, fortran_order, dtype = numpy.lib.format.read_array_header_1_0(stream)
+    else:
+        shape, fortran_order, dtype = numpy.lib.format.read_array_header_2_0(stream)
+
+    count = int(numpy.prod(shape)) if shape else 1
+    array = numpy.frombuffer(body, dtype=dtype, count=count, offset=stream.tell())
+    return array.reshape(shape, order="F" if fortran_order else "C")
+
+
+# Stages the endpoint times itself, published from here because the endpoint's
+# TorchServe workers can't emit embedded metrics. The ultralytics stages share
+# their names with the local detector's, the Mode dimension tells them apart.
+ENDPOINT_TIMED_STAGES = (
+    "s3_get",
+    "b64decode",
+    "imdecode",
+    "preprocess",
+    "inference",
+    "postprocess",
+    "predict",
+    "serialize",
+    # Only in the first response of each endpoint worker
+    "model_load",
+    "warmup",
+)
+
+
+def parse_endpoint_timings(custom_attributes):
+    """Read "timings=stage:ms;stage:ms" set by the endpoint's output_fn"""
+    for attribute in (custom_attributes or "").split(","):
+        key, _, value = attribute.partition("=")
+        if key.strip() == "timings":
+            return {
+                stage: float(ms)
+                for stage, _, ms in (item.partition(":") for item in value.split(";"))
+                if ms
+            }
+    return {}
+
+
+def emit_latency(metrics, mode):
+    """Print latency metrics as an EMF line. Every line also carries the Mode
+    dimension, so the endpoint and local paths can be compared on one graph."""
+    print(
+        json.dumps(
+            {
+                "_aws": {
+                    "Timestamp": int(time.time() * 1000),
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": "Planogram/InvokeYOLO",
+                            "Dimensions": [["EndpointName"], ["Mode"]],
+                            "Metrics": [
+                                {"Name": name, "Unit": "Milliseconds"} for name in metrics
+                            ],
+                        }
+                    ],
+                },
+                "EndpointName": os.getenv("ML_ENDPOINT"),
+                "Mode": mode,
+                **metrics,
+            }
+        )
+    )
+
+
+def log_latency_split(round_trip_ms, endpoint_timings, mode="endpoint"):
+    """Print the endpoint-internal vs network/queueing split, and the
+    endpoint's own stage timings, as an EMF line"""
+    endpoint_ms = endpoint_timings.get("endpoint")
+    metrics = {"round_trip_ms": round(round_trip_ms, 2)}
+    for stage in ENDPOINT_TIMED_STAGES:
+        if stage in endpoint_timings:
+            metrics[f"{stage}_ms"] = endpoint_timings[stage]
+    if endpoint_ms is not None:
+        metrics["endpoint_ms"] = endpoint_ms
+        metrics["network_ms"] = round(round_trip_ms - endpoint_ms, 2)
+    print(f"Endpoint timings (ms): {endpoint_timings}")
+    emit_latency(metrics, mode)
+
+
+def build_custom_attributes():
+    custom_attributes = f"conf={CONF},iou={IOU}"
+    if TILED:
+        custom_attributes += ",tile=1"
+    return custom_attributes
+
+
+def request_boxes(body, content_type):
+    """Call the endpoint and return its (N, 6) float32 array of x1, y1, x2, y2,
+    conf, class"""
+    runtime = get_client("sagemaker-runtime")
+    request_start = time.perf_counter()
+    response = runtime.invoke_endpoint(
+        EndpointName=os.getenv("ML_ENDPOINT"),
+        ContentType=content_type,
+        Accept="application/x-npy",
+        CustomAttributes=build_custom_attributes(),
+        # Lets data capture pair production and shadow responses
+        InferenceId=uuid.uuid4().hex,
+        Body=body,
+    )
+    boxes = decode_npy(response["Body"].read())
+    round_trip_ms = (time.perf_counter() - request_start) * 1000
+
+    log_latency_split(
+        round_trip_ms, parse_endpoint_timings(response.get("CustomAttributes"))
+    )
+    return boxes
+
+
+def detect_locally(original_image):
+    """Run the ONNX detector in this Lambda, returns the same (N, 6) boxes as
+    ``request_boxes`` in the coordinates of ``original_image``"""
+    from onnx_detector import detect
+
+    start = time.perf_counter()
+    model_input, scale, pad = letterbox(original_image)
+    boxes, timings = detect(model_input, CONF, IOU)
+    boxes = scale_boxes_back(boxes, scale, pad, original_image.shape)
+
+    metrics = {
+        name: value for name, value in timings.items() if name.endswith("_ms")
+    }
+    # Per-image latency of the local path, comparable to the endpoint's
+    # round_trip_ms. Cold starts also report model_load_ms, kept out of it.
+    metrics["round_trip_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    print(f"Local timings (ms): {metrics}, cold start: {timings['cold']}")
+    emit_latency(metrics, "local")
+    return boxes
 
-def invoke_YOLO(image_bytes):
+
+def download_and_decode(s3, bucket, key):
+    return decode_image(s3.get_object(Bucket=bucket, Key=key)["Body"].read())
+
+
+def invoke_YOLO_s3(s3, bucket, key):
+    """Detect on an image already in S3 by sending only its URI, the endpoint
+    reads the object itself. The Lambda still needs the pixels to annotate, so
+    it downloads them in parallel, off the critical path of the endpoint call."""
 
     infer_start_time = time.time()
 
-    # Read the image into a numpy array
-    nparr = numpy.frombuffer(image_bytes, numpy.uint8)
+    decoded_image = _decode_pool.submit(download_and_decode, s3, bucket, key)
+    boxes = request_boxes(f"s3://{bucket}/{key}", "application/x-s3-uri")
 
-    # Read the image into a numpy array
-    original_image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    infer_end_time = time.time()
+    print(f"Inference Time = {infer_end_time - infer_start_time:0.4f} seconds")
 
-    # Convert the array into jpeg
-    jpeg = cv2.imencode(".jpg", original_image)[1]
+    return boxes, decoded_image.result()
 
-    # Serialize the jpg using base 64
-    img_payload = base64.b64encode(jpeg).decode("utf-8")
 
-    conf = 0.52
-    iou = 0.75
-    payload = f"{img_payload}|{conf}|{iou}"
+def invoke_YOLO(image_bytes):
 
-    # print(payload)
+    infer_start_time = time.time()
+
+    if LOCAL_INFERENCE:
+        original_image = decode_image(image_bytes)
+        boxes = detect_locally(original_image)
+        print(f"Inference Time = {time.time() - infer_start_time:0.4f} seconds")
+        return boxes, original_image
+
+    # Precedence: tiling needs the original, then client resize (opt-in), then
+    # the JPEG pass-through, then a re-encode of other formats
+    resize = CLIENT_RESIZE and not TILED
+    decoded_image = None
+    if resize:
+        original_image = decode_image(image_bytes)
+        model_input, scale, pad = letterbox(original_image)
+        payload = encode_jpeg(model_input)
+    elif image_bytes[:3] == JPEG_MAGIC:
+        # Already a JPEG: send the original bytes untouched instead of a lossy
+        # decode/re-encode round trip, and decode for annotation in parallel
+        payload = image_bytes
+        decoded_image = _decode_pool.submit(decode_image, image_bytes)
+    else:
+        original_image = decode_image(image_bytes)
+        payload = encode_jpeg(original_image)
 
     print(f"Test payload size: {len(payload)} bytes")
 
-    runtime = boto3.client("sagemaker-runtime")
+    # Send the raw JPEG bytes, conf/iou go in CustomAttributes
+    boxes = request_boxes(payload, "image/jpeg")
+
+    infer_end_time = time.time()
+    print(f"Inference Time = {infer_end_time - infer_start_time:0.4f} seconds")
+
+    if resize:
+        boxes = scale_boxes_back(boxes, scale, pad, original_image.shape)
+    if decoded_image is not None:
+        original_image = decoded_image.result()
+
+    return boxes, original_image
+
+
+def invoke_YOLO_batch(images_bytes):
+    """Detect on several encoded images with a single endpoint call.
+
+    Returns the (N, 6) boxes of each image, in the order of ``images_bytes``.
+    Keep the total payload under MAX_BATCH_BYTES.
+    """
+
+    infer_start_time = time.time()
+
+    # Pack the encoded images into one NPZ archive, keys keep their order
+    buffer = io.BytesIO()
+    numpy.savez(
+        buffer,
+        **{
+            f"image_{i}": numpy.frombuffer(image, numpy.uint8)
+            for i, image in enumerate(images_bytes)
+        },
+    )
+    payload = buffer.getvalue()
+
+    print(f"Batch of {len(images_bytes)} images, payload size: {len(payload)} bytes")
+
+    runtime = get_client("sagemaker-runtime")
+    request_start = time.perf_counter()
     response = runtime.invoke_endpoint(
         EndpointName=os.getenv("ML_ENDPOINT"),
-        ContentType="text/csv",
+        ContentType="application/x-npz",
+        Accept="application/x-npy",
+        CustomAttributes=f"conf={CONF},iou={IOU}",
+        InferenceId=uuid.uuid4().hex,
         Body=payload,
     )
+    # (N, 7) rows of image index, x1, y1, x2, y2, conf, class
+    rows = decode_npy(response["Body"].read())
+    round_trip_ms = (time.perf_counter() - request_start) * 1000
+
+    # Batch round trips cover several images, keep them apart from the
+    # per-image "endpoint" ones
+    log_latency_split(
+        round_trip_ms, parse_endpoint_timings(response.get("CustomAttributes")), "batch"
+    )
 
     infer_end_time = time.time()
-    print(f"Inference Time = {infer_end_time - infer_start_time:0.4f} seconds")
+    print(f"Batch Inference Time = {infer_end_time - infer_start_time:0.4f} seconds")
+
+    return [rows[rows[:, 0] == i, 1:] for i in range(len(images_bytes))]
+
+
+def submit_YOLO_async(bucket, key):
+    """Queue detection of an S3 image on the asynchronous endpoint
+    (ML_ASYNC_ENDPOINT) and return right away.
+
+    The photo itself is the request body, so nothing is uploaded. Keep the
+    returned dict, e.g. in DynamoDB or an SQS message, and pass it to
+    ``collect_YOLO_async`` later.
+    """
+    runtime = get_client("sagemaker-runtime")
+    response = runtime.invoke_endpoint_async(
+        EndpointName=ASYNC_ENDPOINT,
+        InputLocation=f"s3://{bucket}/{key}",
+        ContentType="image/jpeg",
+        Accept="application/x-npy",
+        CustomAttributes=build_custom_attributes(),
+        InvocationTimeoutSeconds=3600,
+    )
+    print(f"Queued async inference {response['InferenceId']} for s3://{bucket}/{key}")
+    return {
+        "inference_id": response["InferenceId"],
+        "output_location": response["OutputLocation"],
+        "failure_location": response.get("FailureLocation"),
+        "submitted_at": time.time(),
+    }
+
+
+def collect_YOLO_async(s3, submission):
+    """Return the boxes of a ``submit_YOLO_async`` request, or None while it is
+    still pending. Polling S3 stands in for the SNS success/error topics."""
 
-    response_body = response["Body"].read()
-    result = json.loads(response_body.decode("ascii"))
+    def read(uri):
+        bucket, _, key = uri.replace("s3://", "", 1).partition("/")
+        try:
+            return s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+        except s3.exceptions.NoSuchKey:
+            return None
+
+    body = read(submission["output_location"])
+    if body is not None:
+        print(
+            f"Async inference {submission['inference_id']} finished after "
+            f"{time.time() - submission['submitted_at']:0.1f} seconds"
+        )
+        return decode_npy(body)
+
+    if submission.get("failure_location"):
+        error = read(submission["failure_location"])
+        if error is not None:
+            raise RuntimeError(
+                f"Async inference {submission['inference_id']} failed: "
+                + error.decode("utf-8", "replace")
+            )
+    return None
+
+
+def invoke_YOLO_async(s3, bucket, key, remaining_ms):
+    """Detect on an S3 image through the asynchronous endpoint, polling for its
+    output while ``remaining_ms()`` leaves ASYNC_RESERVE_MS for the rest of the
+    invocation. Downloads the image for annotation in the meantime."""
+
+    infer_start_time = time.time()
+
+    decoded_image = _decode_pool.submit(download_and_decode, s3, bucket, key)
+    submission = submit_YOLO_async(bucket, key)
+    while True:
+        boxes = collect_YOLO_async(s3, submission)
+        if boxes is not None:
+            break
+        if remaining_ms() < ASYNC_RESERVE_MS + ASYNC_POLL_SECONDS * 1000:
+            # The S3 event is retried, by then the endpoint has scaled up
+            raise TimeoutError(
+                f"Async inference {submission['inference_id']} still pending, "
+                f"output will be at {submission['output_location']}"
+            )
+        time.sleep(ASYNC_POLL_SECONDS)
+
+    infer_end_time = time.time()
+    print(f"Inference Time = {infer_end_time - infer_start_time:0.4f} seconds")
 
-    return result["boxes"], original_image
+    return boxes, decoded_image.result()
@@ -1,61 +1,107 @@
 # import psycopg2
 # from psycopg2.extras import Json
 import os
-import boto3
 import json
 import base64
 from invoke_gen_ai import invoke_claude, invoke_nova
-from invoke_ml_model import invoke_YOLO
+from invoke_ml_model import (
+    ASYNC_ENDPOINT,
+    LOCAL_INFERENCE,
+    MAX_BATCH_BYTES,
+    S3_INPUT,
+    decode_image,
+    invoke_YOLO,
+    invoke_YOLO_async,
+    invoke_YOLO_batch,
+    invoke_YOLO_s3,
+)
 from detect_product import extract_shelves_and_bottles, organize_bottles_by_shelf
 from create_annotated_image import draw_boxes_and_upload_to_S3
 from get_creds import get_secret
 from fix_json import fix_json_structure
 from typing import Dict, Any, Optional, Union
 from dynamodb_writer import DynamoDBWriter
+from aws_clients import get_client
 
+_dynamo_writer = None
+
+
+def get_dynamo_writer():
+    global _dynamo_writer
+    if _dynamo_writer is None:
+        _dynamo_writer = DynamoDBWriter(os.getenv("DB_NAME"))
+    return _dynamo_writer
+
+
+def detect_records(s3, records, context):
+    """Boxes and decoded photo of each S3 record. Several photos uploaded in one
+    event go to the real-time endpoint in a single batched call."""
+    keys = [(r["s3"]["bucket"]["name"], r["s3"]["object"]["key"]) for r in records]
+
+    if ASYNC_ENDPOINT and not LOCAL_INFERENCE:
+        # Queued on the asynchronous endpoint, which reads the image from S3
+        return [
+            invoke_YOLO_async(s3, bucket, key, context.get_remaining_time_in_millis)
+            for bucket, key in keys
+        ]
+    if S3_INPUT and not LOCAL_INFERENCE:
+        # The endpoint reads the image from S3 itself
+        return [invoke_YOLO_s3(s3, bucket, key) for bucket, key in keys]
+
+    images_bytes = [
+        s3.get_object(Bucket=bucket, Key=key)["Body"].read() for bucket, key in keys
+    ]
+    print(f"Get {len(images_bytes)} image(s) from S3 successfully")
+
+    if (
+        len(images_bytes) > 1
+        and not LOCAL_INFERENCE
+        and sum(map(len, images_bytes)) <= MAX_BATCH_BYTES
+    ):
+        boxes = invoke_YOLO_batch(images_bytes)
+        return [(b, decode_image(image)) for b, image in zip(boxes, images_bytes)]
+    return [invoke_YOLO(image_bytes) for image_bytes in images_bytes]
 
-def lambda_handler(event, context):
 
-    bucketName, imageKey = (
-        event["Records"][0]["s3"]["bucket"]["name"],
-        event["Records"][0]["s3"]["object"]["key"],
-    )
+def lambda_handler(event, context):
 
     annotated_image_bucket = os.getenv("ANNOTATED_BUCKET")
-    s3 = boto3.client("s3")
-    image_data = s3.get_object(Bucket=bucketName, Key=imageKey)
-    image_bytes = image_data["Body"].read()
-    print("Get image from S3 successfully")
-
-    detections, originalImage = invoke_YOLO(image_bytes)
-    annotatedImageKey = draw_boxes_and_upload_to_S3(
-        s3, bucketName, imageKey, detections, originalImage
-    )
-    shelves, bottles = extract_shelves_and_bottles(detections)
-    shelf_result = organize_bottles_by_shelf(shelves, bottles)
-    # print(shelf_result)
-
-    json_result = invoke_claude(shelf_result)[1]
-
-    json_result = fix_json_structure(json_result)
-
-    llm_result = json.loads(json_result)
-
-    compliance_assessment = llm_result["refrigerator_analysis"]["target_image_met"]
-    need_review = llm_result["refrigerator_analysis"]["need_review"]
-    review_comment = llm_result["refrigerator_analysis"]["review_comment"]
-
-    dynamo_writer = DynamoDBWriter(os.getenv("DB_NAME"))
-    dynamo_writer.write_single_item(
-        item_data={
-            "image_name": event["Records"][0]["s3"]["object"]["key"],
-            "s3_url": f"https://{annotated_image_bucket}.s3.ap-southeast-1.amazonaws.com/{annotatedImageKey}",
-            "product_count": json.dumps(shelf_result),
-            "compliance_assessment": compliance_assessment,
-            "need_review": need_review,
-            "review_comment": review_comment,
-        }
-    )
-    print("Write result to DB successfully!")
+    s3 = get_client("s3")
+    records = event["Records"]
+    detected = detect_records(s3, records, context)
+
+    for record, (detections, originalImage) in zip(records, detected):
+        bucketName = record["s3"]["bucket"]["name"]
+        imageKey = record["s3"]["object"]["key"]
+
+        annotatedImageKey = draw_boxes_and_upload_to_S3(
+            s3, bucketName, imageKey, detections, originalImage
+        )
+        shelves, bottles = extract_shelves_and_bottles(detections)
+        shelf_result = organize_bottles_by_shelf(shelves, bottles)
+        # print(shelf_result)
+
+        json_result = invoke_claude(shelf_result)[1]
+
+        json_result = fix_json_structure(json_result)
+
+        llm_result = json.loads(json_result)
+
+        compliance_assessment = llm_result["refrigerator_analysis"]["target_image_met"]
+        need_review = llm_result["refrigerator_analysis"]["need_review"]
+        review_comment = llm_result["refrigerator_analysis"]["review_comment"]
+
+        dynamo_writer = get_dynamo_writer()
+        dynamo_writer.write_single_item(
+            item_data={
+                "image_name": imageKey,
+                "s3_url": f"https://{annotated_image_bucket}.s3.ap-southeast-1.amazonaws.com/{annotatedImageKey}",
+                "product_count": json.dumps(shelf_result),
+                "compliance_assessment": compliance_assessment,
+                "need_review": need_review,
+                "review_comment": review_comment,
+            }
+        )
+        print("Write result to DB successfully!")
 
     print("All done!")
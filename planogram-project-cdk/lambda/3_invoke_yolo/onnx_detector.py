@@ -0,0 +1,110 @@
+import os, time, numpy
+
+# In-process detector for low-volume deployments (YOLO_INFERENCE_MODE=local):
+# an int8 ONNX export of the model (build_ecr_image/export_onnx.py) run with
+# ONNX Runtime on the Lambda's CPUs instead of calling the endpoint.
+# The session is created once per container and reused by warm invocations.
+ONNX_MODEL_PATH = os.getenv("ONNX_MODEL_PATH", "/tmp/model.int8.onnx")
+ONNX_MODEL_S3 = os.getenv("ONNX_MODEL_S3")
+MAX_DET = 300
+
+_session = None
+LOAD_STATS = {}
+
+
+def get_session():
+    """Load the ONNX model on first use, downloading it from ONNX_MODEL_S3 if
+    it isn't packaged with the function"""
+    global _session
+    if _session is not None:
+        return _session
+
+    import onnxruntime
+    from aws_clients import get_client
+
+    load_start = time.perf_counter()
+    if not os.path.exists(ONNX_MODEL_PATH):
+        bucket, _, key = ONNX_MODEL_S3.replace("s3://", "", 1).partition("/")
+        get_client("s3").download_file(bucket, key, ONNX_MODEL_PATH)
+    download_ms = (time.perf_counter() - load_start) * 1000
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = os.cpu_count() or 1
+    _session = onnxruntime.InferenceSession(
+        ONNX_MODEL_PATH, options, providers=["CPUExecutionProvider"]
+    )
+
+    LOAD_STATS.update(
+        {
+            "download_ms": round(download_ms, 2),
+            "model_load_ms": round((time.perf_counter() - load_start) * 1000, 2),
+            "cold": True,
+        }
+    )
+    print(f"ONNX model loaded: {LOAD_STATS}")
+    return _session
+
+
+def nms(boxes, scores, iou_threshold):
+    """Greedy NMS over x1, y1, x2, y2 boxes, returns kept indices by score"""
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size and len(keep) < MAX_DET:
+        i = order[0]
+        keep.append(i)
+        xx1 = numpy.maximum(x1[i], x1[order[1:]])
+        yy1 = numpy.maximum(y1[i], y1[order[1:]])
+        xx2 = numpy.minimum(x2[i], x2[order[1:]])
+        yy2 = numpy.minimum(y2[i], y2[order[1:]])
+        inter = numpy.clip(xx2 - xx1, 0, None) * numpy.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[order[1:]] - inter + 1e-9)
+        order = order[1:][iou <= iou_threshold]
+    return numpy.array(keep, dtype=numpy.int64)
+
+
+def postprocess(output, conf, iou):
+    """(1, 4 + classes, anchors) raw YOLO output to (N, 6) x1, y1, x2, y2,
+    conf, class in the letterboxed input space, like ultralytics' NMS"""
+    predictions = output[0].T
+    class_scores = predictions[:, 4:]
+    classes = class_scores.argmax(1)
+    scores = class_scores[numpy.arange(len(classes)), classes]
+    keep = scores > conf
+    predictions, classes, scores = predictions[keep], classes[keep], scores[keep]
+    if not len(scores):
+        return numpy.zeros((0, 6), numpy.float32)
+
+    xy, wh = predictions[:, :2], predictions[:, 2:4]
+    boxes = numpy.concatenate([xy - wh / 2, xy + wh / 2], axis=1)
+    # Offset boxes per class so one NMS pass never suppresses across classes
+    kept = nms(boxes + classes[:, None] * 4096.0, scores, iou)
+    return numpy.concatenate(
+        [boxes[kept], scores[kept, None], classes[kept, None].astype(numpy.float32)],
+        axis=1,
+    ).astype(numpy.float32)
+
+
+def detect(model_input, conf, iou):
+    """Run the detector on a letterboxed BGR image. Returns the boxes and the
+    stage timings in milliseconds."""
+    session = get_session()
+    timings = {"cold": LOAD_STATS.pop("cold", False)}
+    if timings["cold"]:
+        timings["model_load_ms"] = LOAD_STATS["model_load_ms"]
+
+    start = time.perf_counter()
+    tensor = model_input[:, :, ::-1].transpose(2, 0, 1)  # BGR HWC -> RGB CHW
+    tensor = numpy.ascontiguousarray(tensor, dtype=numpy.float32)[None] / 255.0
+    timings["preprocess_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    start = time.perf_counter()
+    output = session.run(None, {session.get_inputs()[0].name: tensor})[0]
+    timings["inference_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    start = time.perf_counter()
+    boxes = postprocess(output, conf, iou)
+    timings["postprocess_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return boxes, timings
@@ -0,0 +1,76 @@
+import os, json
+
+# The prompt files are read and split once per container, each call only
+# fills in the shelf data.
+PROMPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SHELF_DATA_SLOT = "{shelf_data}"
+
+# Mark the system block, the stable prefix of every request, with
+# cache_control so Bedrock can reuse it across calls. Needs a model with prompt
+# caching, and the prefix has to reach the model's minimum length (1024 tokens
+# for Sonnet) before Bedrock actually caches it: the worked examples of
+# 1_examples.txt are part of the system block and take it past that. The
+# prompt itself is the same with caching on or off.
+PROMPT_CACHE = os.getenv("BEDROCK_PROMPT_CACHE", "false").lower() == "true"
+
+GENERATION_PARAMS = {
+    "anthropic_version": "bedrock-2023-05-31",
+    "max_tokens": 500,
+    "top_p": 0.9,
+    "top_k": 20,
+    "temperature": 0,
+}
+
+
+def read_prompt(name):
+    with open(os.path.join(PROMPT_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+class PromptTemplate:
+    """A template with one {shelf_data} slot, split around it once"""
+
+    def __init__(self, text):
+        if SHELF_DATA_SLOT not in text:
+            raise ValueError(f"Prompt template has no {SHELF_DATA_SLOT} slot")
+        self.prefix, _, self.suffix = text.partition(SHELF_DATA_SLOT)
+
+    def render(self, shelf_data):
+        return self.prefix + shelf_data + self.suffix
+
+
+def text_block(text, cache=False):
+    block = {"type": "text", "text": text}
+    if cache:
+        block["cache_control"] = {"type": "ephemeral"}
+    return block
+
+
+SYSTEM_PROMPT = read_prompt("1_system_prompt.txt")
+EXAMPLES = read_prompt("1_examples.txt")
+INSTRUCTIONS = read_prompt("2_instructions.txt")
+LAST_MESSAGE = read_prompt("3_last_message.txt")
+
+INSTRUCTIONS_TEMPLATE = PromptTemplate(INSTRUCTIONS)
+
+# Pre-rendered, never changes between calls
+SYSTEM = [text_block(f"{SYSTEM_PROMPT.strip()}\n\n{EXAMPLES}", cache=PROMPT_CACHE)]
+
+
+def build_claude_body(shelf_result):
+    """Bedrock request body for the shelf analysis of one image"""
+    shelf_data = json.dumps(shelf_result, indent=2, ensure_ascii=False)
+
+    return {
+        **GENERATION_PARAMS,
+        "system": SYSTEM,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    text_block(INSTRUCTIONS_TEMPLATE.render(shelf_data)),
+                    text_block(LAST_MESSAGE),
+                ],
+            }
+        ],
+    }
@@ -17,7 +17,6 @@ class CreateEndpointLambdaCdkStack(Stack):
         scope: Construct,
         construct_id: str,
         config: dict,
-        lambda_layers_stack=None,
         s3_bucket_stack=None,
         **kwargs,
     ) -> None:
@@ -56,10 +55,9 @@ class CreateEndpointLambdaCdkStack(Stack):
             ],
         )
 
-        self.sagemaker_layer = lambda_.LayerVersion.from_layer_version_arn(
-            self,
-            "SageMakerLayer",
-            lambda_layers_stack.sagemaker_layer.layer_version_arn,
+        # Async endpoints publish completion notifications when topics are given
+        self.endpoint_role.add_to_policy(
+            iam.PolicyStatement(actions=["sns:Publish"], resources=["*"])
         )
 
         self.create_endpoint_function = lambda_.Function(
@@ -72,10 +70,17 @@ class CreateEndpointLambdaCdkStack(Stack):
             memory_size=512,
             ephemeral_storage_size=Size.mebibytes(1024),
             role=self.create_endpoint_lambda_role,
-            layers=[self.sagemaker_layer],
             environment={
                 "S3_MODEL_BUCKET": f"s3://{s3_bucket_stack.training_bucket.bucket_name}/tranining-model",
                 "ENDPOINT_ROLE": f"{self.endpoint_role.role_arn}",
+                "ENDPOINT_NAME": config.get("endpoint", {}).get("name", "yolo11x-endpoint"),
+                "ASYNC_ENDPOINT_NAME": config.get("endpoint", {}).get(
+                    "async_name", "yolo11x-async-endpoint"
+                ),
+                "CAPTURE_S3": f"s3://{s3_bucket_stack.training_bucket.bucket_name}/data-capture",
+                "ASYNC_OUTPUT_S3": f"s3://{s3_bucket_stack.training_bucket.bucket_name}/async-inference",
+                # Empty: the Lambda resolves the PyTorch DLC image for its region
+                "INFERENCE_IMAGE_URI": config.get("endpoint", {}).get("inference_image", ""),
             },
             description="Create Endpoint on Amazon SageMaker",
         )
@@ -81,6 +81,73 @@ class InvokeYOLOLambdaCdkStack(Stack):
             lambda_layers_stack.opencv_layer.layer_version_arn,
         )
 
+        layers = [self.opencv_layer]
+        environment = {
+            "DB_NAME": f"{table_dynamodb_stack.table.table_name}",
+            # Stable name, 2_create_endpoint creates it and swaps models behind it
+            "ML_ENDPOINT": config.get("endpoint", {}).get("name", "yolo11x-endpoint"),
+            "INFERENCE_PROFILE": f"{bedrock_inference_profile_stack.profileARN}",
+            "ANNOTATED_BUCKET": f"{self.test_bucket.bucket_name}",
+            "DEFAULT_REGION": "ap-southeast-1",
+            # Letterboxes the photo to YOLO_IMGSZ before sending it. Off, JPEG
+            # photos are sent as they are without a re-encode.
+            "YOLO_CLIENT_RESIZE": str(
+                self.stack_config.get("client_resize", False)
+            ).lower(),
+            "YOLO_IMGSZ": "640",
+            # Sends the endpoint the image's S3 URI instead of its bytes. This
+            # bypasses the client-side resize and the JPEG pass-through above.
+            "YOLO_S3_INPUT": str(self.stack_config.get("s3_input", False)).lower(),
+            # Only with a Bedrock model that supports prompt caching
+            "BEDROCK_PROMPT_CACHE": str(
+                self.stack_config.get("prompt_cache", False)
+            ).lower(),
+        }
+        memory_size = 512
+
+        # Queue photos on the asynchronous endpoint, deployed by
+        # 2_create_endpoint with "mode": "async", instead of the real-time one
+        if self.stack_config.get("async_inference", False):
+            environment["ML_ASYNC_ENDPOINT"] = config.get("endpoint", {}).get(
+                "async_name", "yolo11x-async-endpoint"
+            )
+
+        # Low-volume deployments can run the int8 ONNX model in the Lambda
+        # instead of keeping an endpoint up. Lambda CPU scales with memory.
+        inference_mode = self.stack_config.get("inference_mode", "endpoint")
+        if inference_mode not in ("endpoint", "local"):
+            raise ValueError(
+                f'invoke_yolo_lambda_cdk_stack.inference_mode must be "endpoint" or '
+                f'"local", got "{inference_mode}"'
+            )
+        if inference_mode == "local":
+            if "ML_ASYNC_ENDPOINT" in environment:
+                raise ValueError(
+                    'invoke_yolo_lambda_cdk_stack.inference_mode "local" can\'t be '
+                    "combined with async_inference"
+                )
+            if lambda_layers_stack.onnxruntime_layer is None:
+                raise ValueError(
+                    'invoke_yolo_lambda_cdk_stack.inference_mode "local" needs '
+                    "lambda_layers_cdk_stack.onnxruntime_layer_s3_key"
+                )
+            if not self.stack_config.get("onnx_model_s3"):
+                raise ValueError(
+                    'invoke_yolo_lambda_cdk_stack.inference_mode "local" needs '
+                    "invoke_yolo_lambda_cdk_stack.onnx_model_s3, the S3 URI of the "
+                    "model exported by build_ecr_image/export_onnx.py"
+                )
+            layers.append(
+                lambda_.LayerVersion.from_layer_version_arn(
+                    self,
+                    "ONNXRuntimeLayer",
+                    lambda_layers_stack.onnxruntime_layer.layer_version_arn,
+                )
+            )
+            environment["YOLO_INFERENCE_MODE"] = "local"
+            environment["ONNX_MODEL_S3"] = self.stack_config["onnx_model_s3"]
+            memory_size = int(self.stack_config.get("local_memory_size", 3008))
+
         self.invoke_yolo_function = lambda_.Function(
             self,
             "invoke_yolo",
@@ -88,17 +155,11 @@ class InvokeYOLOLambdaCdkStack(Stack):
             code=lambda_.Code.from_asset("lambda/3_invoke_yolo"),
             handler="lambda_function.lambda_handler",
             timeout=Duration.seconds(300),
-            memory_size=512,
+            memory_size=memory_size,
             ephemeral_storage_size=Size.mebibytes(2048),
             role=self.invoke_yolo_lambda_role,
-            layers=[self.opencv_layer],
-            environment={
-                "DB_NAME": f"{table_dynamodb_stack.table.table_name}",
-                "ML_ENDPOINT": "REPLACE_THIS",
-                "INFERENCE_PROFILE": f"{bedrock_inference_profile_stack.profileARN}",
-                "ANNOTATED_BUCKET": f"{self.test_bucket.bucket_name}",
-                "DEFAULT_REGION": "ap-southeast-1",
-            },
+            layers=layers,
+            environment=environment,
             vpc=vpc_stack.vpc,
             vpc_subnets=ec2.SubnetSelection(subnets=[vpc_stack.selected_subnet]),
             security_groups=[vpc_stack.lambda_security_group],
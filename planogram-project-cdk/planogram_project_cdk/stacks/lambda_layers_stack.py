@@ -43,33 +43,37 @@ class LambdaLayersStack(Stack):
             removal_policy=RemovalPolicy.DESTROY,
         )
 
-        # SageMaker Layer
-        self.sagemaker_layer = lambda_.LayerVersion(
-            self,
-            "SageMakerLayer",
-            code=lambda_.S3Code(
-                bucket=s3.Bucket.from_bucket_name(
-                    self,
-                    "SageMakerLayerBucket",
-                    bucket_name=self.stack_config.get(
-                        "sagemaker_layer_bucket_name", "default-layer-bucket"
+        # ONNX Runtime Layer, only for invoke_yolo's local inference mode
+        self.onnxruntime_layer = None
+        if self.stack_config.get("onnxruntime_layer_s3_key"):
+            self.onnxruntime_layer = lambda_.LayerVersion(
+                self,
+                "ONNXRuntimeLayer",
+                code=lambda_.S3Code(
+                    bucket=s3.Bucket.from_bucket_name(
+                        self,
+                        "ONNXRuntimeLayerBucket",
+                        # Same bucket as the OpenCV layer unless configured
+                        bucket_name=self.stack_config.get(
+                            "onnxruntime_layer_bucket_name",
+                            self.stack_config.get(
+                                "opencv_layer_bucket_name", "default-layer-bucket"
+                            ),
+                        ),
                     ),
+                    key=self.stack_config["onnxruntime_layer_s3_key"],
                 ),
-                key=self.stack_config.get(
-                    "sagemaker_layer_s3_key", "layers/sagemaker.zip"
+                compatible_runtimes=[
+                    lambda_.Runtime.PYTHON_3_11,
+                ],
+                layer_version_name=self.stack_config.get(
+                    "onnxruntime_layer_name", "PlanogramONNXRuntimeLayer"
                 ),
-            ),
-            compatible_runtimes=[
-                lambda_.Runtime.PYTHON_3_11,
-            ],
-            layer_version_name=self.stack_config.get(
-                "sagemaker_layer_name", "PlanogramSageMakerLayer"
-            ),
-            description="SageMaker Lambda layer for Planogram project",
-            removal_policy=RemovalPolicy.DESTROY,
-        )
+                description="ONNX Runtime Lambda layer for Planogram project",
+                removal_policy=RemovalPolicy.DESTROY,
+            )
 
-        # Output the layer ARNs for reference
+        # Output the layer ARN for reference
         CfnOutput(
             self,
             "OpenCVLayerArn",
@@ -77,11 +81,3 @@ class LambdaLayersStack(Stack):
             description="ARN of the OpenCV Lambda layer",
             export_name="planogram-opencv-layer-arn",
         )
-
-        CfnOutput(
-            self,
-            "SageMakerLayerArn",
-            value=self.sagemaker_layer.layer_version_arn,
-            description="ARN of the SageMaker Lambda layer",
-            export_name="planogram-sagemaker-layer-arn",
-        )
@@ -0,0 +1,139 @@
+import os
+import sys
+
+import pytest
+from botocore.stub import ANY, Stubber
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(__file__), "..", "..", "lambda", "2_create_endpoint"),
+)
+os.environ.setdefault("AWS_DEFAULT_REGION", "ap-southeast-1")
+
+import lambda_function  # noqa: E402
+
+ENDPOINT_NAME = "yolo11x-endpoint"
+ARN = "arn:aws:sagemaker:ap-southeast-1:123456789012"
+
+
+@pytest.fixture(autouse=True)
+def endpoint_env(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "ap-southeast-1")
+    monkeypatch.setenv("S3_MODEL_BUCKET", "s3://training-bucket/tranining-model")
+    monkeypatch.setenv("ENDPOINT_ROLE", "arn:aws:iam::123456789012:role/endpoint")
+    monkeypatch.setenv("ENDPOINT_NAME", ENDPOINT_NAME)
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+
+
+@pytest.fixture
+def sagemaker():
+    with Stubber(lambda_function.sagemaker_client) as stubber:
+        yield stubber
+        stubber.assert_no_pending_responses()
+
+
+def expect_missing_endpoint(stubber):
+    stubber.add_client_error(
+        "describe_endpoint",
+        service_error_code="ValidationException",
+        service_message=f"Could not find endpoint {ENDPOINT_NAME}",
+        expected_params={"EndpointName": ENDPOINT_NAME},
+    )
+
+
+def expect_live_endpoint(stubber, instance_count=2):
+    stubber.add_response(
+        "describe_endpoint",
+        {
+            "EndpointName": ENDPOINT_NAME,
+            "EndpointArn": f"{ARN}:endpoint/{ENDPOINT_NAME}",
+            "EndpointConfigName": "yolo11x-model-old-config",
+            "EndpointStatus": "InService",
+            "CreationTime": "2025-01-01T00:00:00Z",
+            "LastModifiedTime": "2025-01-01T00:00:00Z",
+            "ProductionVariants": [
+                {
+                    "VariantName": "AllTraffic",
+                    "CurrentInstanceCount": instance_count,
+                    "DesiredInstanceCount": instance_count,
+                }
+            ],
+        },
+        {"EndpointName": ENDPOINT_NAME},
+    )
+
+
+def expect_model(stubber):
+    stubber.add_response("create_model", {"ModelArn": f"{ARN}:model/yolo11x-model"})
+
+
+def expect_endpoint_config(stubber):
+    stubber.add_response(
+        "create_endpoint_config",
+        {"EndpointConfigArn": f"{ARN}:endpoint-config/yolo11x-model-config"},
+    )
+
+
+def test_first_deploy_creates_the_stable_endpoint(sagemaker):
+    expect_missing_endpoint(sagemaker)
+    expect_model(sagemaker)
+    expect_endpoint_config(sagemaker)
+    expect_missing_endpoint(sagemaker)
+    sagemaker.add_response(
+        "create_endpoint",
+        {"EndpointArn": f"{ARN}:endpoint/{ENDPOINT_NAME}"},
+        {"EndpointName": ENDPOINT_NAME, "EndpointConfigName": ANY, "Tags": ANY},
+    )
+
+    body = lambda_function.lambda_handler({"train_folder": "job"}, None)["body"]
+    assert body["endpoint_name"] == ENDPOINT_NAME
+    assert body["status"] == "Creating"
+
+
+def test_later_deploy_updates_the_stable_endpoint(sagemaker):
+    expect_live_endpoint(sagemaker)
+    expect_model(sagemaker)
+    # current_instance_count checks the endpoint and reads its variant
+    expect_live_endpoint(sagemaker)
+    expect_live_endpoint(sagemaker)
+    expect_endpoint_config(sagemaker)
+    expect_live_endpoint(sagemaker)
+    sagemaker.add_response(
+        "update_endpoint",
+        {"EndpointArn": f"{ARN}:endpoint/{ENDPOINT_NAME}"},
+        {
+            "EndpointName": ENDPOINT_NAME,
+            "EndpointConfigName": ANY,
+            "DeploymentConfig": ANY,
+        },
+    )
+
+    body = lambda_function.lambda_handler(
+        {"train_folder": "job", "update": "false"}, None
+    )["body"]
+    assert body["endpoint_name"] == ENDPOINT_NAME
+    assert body["status"] == "Updating"
+
+
+def test_update_needs_an_existing_endpoint(sagemaker):
+    expect_missing_endpoint(sagemaker)
+
+    with pytest.raises(ValueError):
+        lambda_function.lambda_handler({"train_folder": "job", "update": "true"}, None)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (True, True),
+        ("true", True),
+        ("Yes", True),
+        (1, True),
+        ("false", False),
+        (False, False),
+        (None, False),
+    ],
+)
+def test_event_flag(value, expected):
+    assert lambda_function.event_flag({"update": value}, "update") is expected
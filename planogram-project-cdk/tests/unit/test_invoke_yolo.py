@@ -0,0 +1,130 @@
+import io
+import os
+import sys
+
+import cv2
+import numpy
+import pytest
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(__file__), "..", "..", "lambda", "3_invoke_yolo"),
+)
+
+import invoke_ml_model  # noqa: E402
+
+BOX = numpy.array([[100, 200, 300, 400, 0.9, 0]], dtype=numpy.float32)
+
+
+def jpeg_photo(width=1280, height=960):
+    image = numpy.full((height, width, 3), 128, numpy.uint8)
+    return cv2.imencode(".jpg", image)[1].tobytes()
+
+
+@pytest.fixture
+def endpoint(monkeypatch):
+    """Records what invoke_YOLO sends instead of calling the endpoint"""
+    requests = []
+
+    def request_boxes(body, content_type):
+        requests.append(body)
+        return BOX.copy()
+
+    monkeypatch.setattr(invoke_ml_model, "request_boxes", request_boxes)
+    return requests
+
+
+def test_jpeg_pass_through_by_default(endpoint):
+    photo = jpeg_photo()
+    boxes, original_image = invoke_ml_model.invoke_YOLO(photo)
+
+    assert endpoint == [photo]
+    assert original_image.shape == (960, 1280, 3)
+    numpy.testing.assert_array_equal(boxes, BOX)
+
+
+def test_client_resize_wins_over_pass_through(endpoint, monkeypatch):
+    monkeypatch.setattr(invoke_ml_model, "CLIENT_RESIZE", True)
+    photo = jpeg_photo()
+    boxes, original_image = invoke_ml_model.invoke_YOLO(photo)
+
+    sent = invoke_ml_model.decode_image(endpoint[0])
+    assert sent.shape == (invoke_ml_model.IMGSZ, invoke_ml_model.IMGSZ, 3)
+    assert original_image.shape == (960, 1280, 3)
+    # 1280x960 is scaled by 0.5 and padded by 80 rows on top
+    numpy.testing.assert_allclose(boxes[0, :4], [200, 240, 600, 640])
+
+
+def test_tiling_keeps_the_original(endpoint, monkeypatch):
+    monkeypatch.setattr(invoke_ml_model, "CLIENT_RESIZE", True)
+    monkeypatch.setattr(invoke_ml_model, "TILED", True)
+    photo = jpeg_photo()
+    invoke_ml_model.invoke_YOLO(photo)
+
+    assert endpoint == [photo]
+
+
+@pytest.fixture
+def async_endpoint(monkeypatch):
+    """Async endpoint whose output appears on the second poll"""
+    polls = []
+    image = numpy.zeros((960, 1280, 3), numpy.uint8)
+
+    def collect(s3, submission):
+        polls.append(submission["inference_id"])
+        return BOX.copy() if len(polls) > 1 else None
+
+    monkeypatch.setattr(invoke_ml_model, "ASYNC_POLL_SECONDS", 0)
+    monkeypatch.setattr(invoke_ml_model, "download_and_decode", lambda *args: image)
+    monkeypatch.setattr(
+        invoke_ml_model,
+        "submit_YOLO_async",
+        lambda bucket, key: {
+            "inference_id": "abc",
+            "output_location": f"s3://async/{key}.out",
+        },
+    )
+    monkeypatch.setattr(invoke_ml_model, "collect_YOLO_async", collect)
+    return polls
+
+
+def test_async_waits_for_the_output(async_endpoint):
+    boxes, original_image = invoke_ml_model.invoke_YOLO_async(
+        None, "photos", "fridge.jpg", lambda: 200000
+    )
+
+    assert async_endpoint == ["abc", "abc"]
+    assert original_image.shape == (960, 1280, 3)
+    numpy.testing.assert_array_equal(boxes, BOX)
+
+
+def test_async_gives_up_before_the_lambda_times_out(async_endpoint):
+    with pytest.raises(TimeoutError):
+        invoke_ml_model.invoke_YOLO_async(None, "photos", "fridge.jpg", lambda: 30000)
+    assert async_endpoint == ["abc"]
+
+
+def test_batch_splits_boxes_per_image(monkeypatch):
+    requests = []
+    # Image 1 has no detections
+    rows = numpy.array(
+        [[0, 1, 2, 3, 4, 0.9, 1], [2, 5, 6, 7, 8, 0.8, 2], [0, 9, 9, 9, 9, 0.7, 0]],
+        dtype=numpy.float32,
+    )
+
+    class Runtime:
+        def invoke_endpoint(self, **request):
+            requests.append(request)
+            body = io.BytesIO()
+            numpy.save(body, rows)
+            return {"Body": io.BytesIO(body.getvalue())}
+
+    monkeypatch.setattr(invoke_ml_model, "get_client", lambda service: Runtime())
+    photos = [jpeg_photo(), jpeg_photo(640, 480), jpeg_photo(320, 240)]
+    boxes = invoke_ml_model.invoke_YOLO_batch(photos)
+
+    assert requests[0]["Accept"] == "application/x-npy"
+    with numpy.load(io.BytesIO(requests[0]["Body"])) as archive:
+        assert [archive[f"image_{i}"].tobytes() for i in range(3)] == photos
+    assert [len(b) for b in boxes] == [2, 0, 1]
+    numpy.testing.assert_array_equal(boxes[2], rows[1:2, 1:])
@@ -0,0 +1,40 @@
+import importlib
+import os
+import re
+import sys
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(__file__), "..", "..", "lambda", "3_invoke_yolo"),
+)
+
+import prompt_templates  # noqa: E402
+
+SHELF_RESULT = {"shelves": [{"shelf_number": 1, "drinks": {"joco": 6}}]}
+
+
+def build_body(monkeypatch, prompt_cache):
+    monkeypatch.setenv("BEDROCK_PROMPT_CACHE", prompt_cache)
+    return importlib.reload(prompt_templates).build_claude_body(SHELF_RESULT)
+
+
+def strip_cache_control(body):
+    for block in body["system"] + body["messages"][0]["content"]:
+        block.pop("cache_control", None)
+    return body
+
+
+def test_caching_only_marks_the_system_block(monkeypatch):
+    cached = build_body(monkeypatch, "true")
+    plain = build_body(monkeypatch, "false")
+
+    assert [b.get("cache_control") for b in cached["system"]] == [{"type": "ephemeral"}]
+    assert not any("cache_control" in b for b in cached["messages"][0]["content"])
+    # Same prompt in the same order either way
+    assert strip_cache_control(cached) == plain
+
+
+def test_cached_prefix_reaches_the_minimum_length():
+    # Words and punctuation undercount Claude's tokens, so this is a lower bound
+    system_text = prompt_templates.SYSTEM[0]["text"]
+    assert len(re.findall(r"\w+|[^\w\s]", system_text)) >= 1024
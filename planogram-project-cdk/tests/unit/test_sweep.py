@@ -0,0 +1,251 @@
+import io
+import os
+import sys
+from datetime import datetime, timezone
+
+import boto3
+import pytest
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(__file__), "..", "..", "lambda", "1_create_training_job"),
+)
+
+from sweep import generate_trials, should_stop, start_sweep, step_sweep  # noqa: E402
+
+OUTPUT_S3 = "s3://training-bucket/tranining-model"
+METRIC = "metrics/mAP50-95(B)"
+
+
+@pytest.fixture(autouse=True)
+def training_env(monkeypatch):
+    monkeypatch.setenv("SAGEMAKER_ROLE_ARN", "arn:aws:iam::123456789012:role/sagemaker")
+    monkeypatch.setenv(
+        "ECR_IMAGE_URI", "123456789012.dkr.ecr.us-east-1.amazonaws.com/yolo11:latest"
+    )
+
+
+@pytest.fixture
+def sagemaker():
+    client = boto3.client(
+        "sagemaker",
+        region_name="us-east-1",
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+    )
+    with Stubber(client) as stubber:
+        yield client, stubber
+        stubber.assert_no_pending_responses()
+
+
+@pytest.fixture
+def s3():
+    client = boto3.client(
+        "s3",
+        region_name="us-east-1",
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+    )
+    with Stubber(client) as stubber:
+        yield client, stubber
+        stubber.assert_no_pending_responses()
+
+
+def sweep_event(max_jobs=4, max_concurrent=2, min_epochs=2):
+    return {
+        "training_data_s3": "s3://training-bucket/train",
+        "validation_data_s3": "s3://training-bucket/val",
+        "output_s3": OUTPUT_S3,
+        "instance_type": "ml.g4dn.xlarge",
+        "sweep": {
+            "max_jobs": max_jobs,
+            "max_concurrent": max_concurrent,
+            "min_epochs": min_epochs,
+            "parameters": {
+                "learning-rate": {"min": 0.001, "max": 0.1, "scale": "log"},
+                "imgsz": {"min": 480, "max": 800},
+                "epochs": [50, 100],
+            },
+        },
+    }
+
+
+def describe_response(job_name, status):
+    # No TrainingStartTime, so describe_startup doesn't read startup.json
+    return {
+        "TrainingJobName": job_name,
+        "TrainingJobArn": f"arn:aws:sagemaker:us-east-1:123456789012:training-job/{job_name}",
+        "ModelArtifacts": {"S3ModelArtifacts": f"{OUTPUT_S3}/{job_name}/output/model.tar.gz"},
+        "TrainingJobStatus": status,
+        "SecondaryStatus": "Training" if status == "InProgress" else status,
+        "AlgorithmSpecification": {"TrainingInputMode": "File"},
+        "ResourceConfig": {"InstanceCount": 1, "VolumeSizeInGB": 20},
+        "StoppingCondition": {"MaxRuntimeInSeconds": 86400},
+        "CreationTime": datetime(2025, 1, 1, tzinfo=timezone.utc),
+    }
+
+
+def results_csv(values):
+    # ultralytics pads its column names with spaces
+    rows = ["                  epoch,      metrics/mAP50(B),   metrics/mAP50-95(B)"]
+    rows += [f"{i + 1},{value + 0.2:.5f},{value:.5f}" for i, value in enumerate(values)]
+    data = "\n".join(rows).encode("utf-8")
+    return {"Body": StreamingBody(io.BytesIO(data), len(data))}
+
+
+def expect_refresh(sagemaker_stubber, s3_stubber, job_name, status, history):
+    sagemaker_stubber.add_response(
+        "describe_training_job",
+        describe_response(job_name, status),
+        {"TrainingJobName": job_name},
+    )
+    s3_stubber.add_response(
+        "get_object",
+        results_csv(history),
+        {
+            "Bucket": "training-bucket",
+            "Key": f"tranining-model/{job_name}/checkpoints/results.csv",
+        },
+    )
+
+
+def test_generate_trials_from_ranges():
+    parameters = sweep_event()["sweep"]["parameters"]
+    trials = generate_trials(parameters, 8, seed=1)
+
+    assert len(trials) == 8
+    for trial in trials:
+        assert 0.001 <= trial["learning-rate"] <= 0.1
+        assert 480 <= trial["imgsz"] <= 800
+        assert trial["imgsz"] % 32 == 0
+        assert trial["epochs"] in (50, 100)
+    # Same seed, same sweep
+    assert generate_trials(parameters, 8, seed=1) == trials
+
+
+def test_generate_trials_grid_is_capped():
+    parameters = {"imgsz": [512, 640], "epochs": [50, 100, 200]}
+    trials = generate_trials(parameters, 4)
+
+    assert len(trials) == 4
+    assert len({(t["imgsz"], t["epochs"]) for t in trials}) == 4
+
+
+def test_generate_trials_rejects_unknown_parameters():
+    with pytest.raises(ValueError):
+        generate_trials({"momentum": [0.9]}, 2)
+
+
+def test_concurrency_cap(sagemaker, s3):
+    sagemaker_client, sagemaker_stubber = sagemaker
+    s3_client, s3_stubber = s3
+    state = start_sweep(sweep_event(max_jobs=4, max_concurrent=2))
+    names = [t["job_name"] for t in state["trials"]]
+
+    # First poll launches only max_concurrent jobs
+    for name in names[:2]:
+        sagemaker_stubber.add_response(
+            "create_training_job",
+            {"TrainingJobArn": f"arn:aws:sagemaker:us-east-1:123456789012:training-job/{name}"},
+        )
+    state = step_sweep(state, sagemaker_client, s3_client)
+    assert [t["status"] for t in state["trials"]] == [
+        "InProgress",
+        "InProgress",
+        "Pending",
+        "Pending",
+    ]
+
+    # One finishes, exactly one pending job takes its slot
+    expect_refresh(sagemaker_stubber, s3_stubber, names[0], "Completed", [0.3, 0.4])
+    expect_refresh(sagemaker_stubber, s3_stubber, names[1], "InProgress", [0.2])
+    sagemaker_stubber.add_response(
+        "create_training_job",
+        {"TrainingJobArn": f"arn:aws:sagemaker:us-east-1:123456789012:training-job/{names[2]}"},
+    )
+    state = step_sweep(state, sagemaker_client, s3_client)
+    assert [t["status"] for t in state["trials"]] == [
+        "Completed",
+        "InProgress",
+        "InProgress",
+        "Pending",
+    ]
+    assert state["status"] == "InProgress"
+
+
+def test_median_early_stopping(sagemaker, s3):
+    sagemaker_client, sagemaker_stubber = sagemaker
+    s3_client, s3_stubber = s3
+    state = start_sweep(sweep_event(max_jobs=3, max_concurrent=3, min_epochs=3))
+    for trial in state["trials"]:
+        trial["status"] = "InProgress"
+    names = [t["job_name"] for t in state["trials"]]
+
+    histories = {
+        names[0]: [0.30, 0.40, 0.45],
+        names[1]: [0.25, 0.35, 0.42],
+        names[2]: [0.10, 0.15, 0.20],  # below the median of its peers
+    }
+    for name in names:
+        expect_refresh(sagemaker_stubber, s3_stubber, name, "InProgress", histories[name])
+    sagemaker_stubber.add_response("stop_training_job", {}, {"TrainingJobName": names[2]})
+
+    state = step_sweep(state, sagemaker_client, s3_client)
+
+    assert [t["stopped_early"] for t in state["trials"]] == [False, False, True]
+    assert state["trials"][2]["status"] == "Stopping"
+    assert state["trials"][2]["history"] == histories[names[2]]
+
+
+def test_no_early_stopping_before_min_epochs(sagemaker, s3):
+    sagemaker_client, sagemaker_stubber = sagemaker
+    s3_client, s3_stubber = s3
+    state = start_sweep(sweep_event(max_jobs=3, max_concurrent=3, min_epochs=5))
+    for trial in state["trials"]:
+        trial["status"] = "InProgress"
+
+    for name, history in zip(
+        [t["job_name"] for t in state["trials"]],
+        [[0.3, 0.4], [0.3, 0.4], [0.05, 0.06]],
+    ):
+        expect_refresh(sagemaker_stubber, s3_stubber, name, "InProgress", history)
+
+    # No stop_training_job is stubbed, the Stubber fails on an unexpected call
+    state = step_sweep(state, sagemaker_client, s3_client)
+    assert not any(t["stopped_early"] for t in state["trials"])
+
+
+def test_min_epochs_must_be_positive():
+    with pytest.raises(ValueError):
+        start_sweep(sweep_event(min_epochs=0))
+
+
+def test_no_early_stopping_without_history():
+    trials = [{"history": []}, {"history": [0.3]}, {"history": [0.4]}]
+    assert not should_stop(trials[0], trials, min_epochs=0)
+
+
+def test_best_job_selection(sagemaker, s3):
+    sagemaker_client, sagemaker_stubber = sagemaker
+    s3_client, s3_stubber = s3
+    state = start_sweep(sweep_event(max_jobs=3, max_concurrent=3))
+    trials = state["trials"]
+    trials[0].update(status="Completed", history=[0.30, 0.50, 0.48])
+    trials[1].update(status="Stopped", stopped_early=True, history=[0.10, 0.12])
+    trials[2]["status"] = "InProgress"
+
+    # Best is judged on the best epoch, not the last one
+    expect_refresh(
+        sagemaker_stubber, s3_stubber, trials[2]["job_name"], "Completed", [0.40, 0.49]
+    )
+    state = step_sweep(state, sagemaker_client, s3_client)
+
+    assert state["status"] == "Completed"
+    assert state["best"] == {
+        "job_name": trials[0]["job_name"],
+        "hyperparameters": trials[0]["hyperparameters"],
+        "metric": METRIC,
+        "value": 0.50,
+    }